@@ -0,0 +1,53 @@
+"""
+games/{id}/analysis/ throughput: the bare tablebase lookup (position value
+plus every move score) and the whole endpoint through the test client.
+
+Run from the project root:
+    python benchmarks/bench_analysis.py
+"""
+import time
+
+from common import setup_django
+
+setup_django('bench_analysis.sqlite3')
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from game.models import Game  # noqa: E402
+from game.tablebase import board_masks, tablebase  # noqa: E402
+
+BOARD = 'X...O...X'
+
+
+def main():
+    tablebase.score(0, 0)  # map the file outside the timings
+
+    count = 100000
+    start = time.perf_counter()
+    for _ in range(count):
+        x, o = board_masks(BOARD)
+        tablebase.score(x, o)
+        for _ in tablebase.move_scores(x, o):
+            pass
+    elapsed = time.perf_counter() - start
+    print(f'lookup: {elapsed / count * 1e6:.2f} us per analysis, {count / elapsed:,.0f}/s')
+
+    alice = User.objects.create_user('alice')
+    bob = User.objects.create_user('bob')
+    game = Game.objects.create(player1=alice, player2=bob, current_turn=bob, board=BOARD)
+    client = APIClient()
+    client.force_authenticate(alice)
+    url = f'/api/games/{game.id}/analysis/'
+    client.get(url)
+
+    count = 2000
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(url)
+    elapsed = time.perf_counter() - start
+    print(f'endpoint: {elapsed / count * 1e3:.2f} ms per request, {count / elapsed:,.0f}/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Archiving finished games: throughput of `manage.py archive_games`, and the
+cost of the reads it touches before and after, the ongoing-games listing
+(served by the partial game_ongoing_idx) and a page of match history,
+which then merges the live and archive tables.
+
+Run from the project root:
+    python benchmarks/bench_archive.py [games]
+"""
+import sys
+import time
+from datetime import timedelta
+
+from common import setup_django, timed
+
+setup_django('bench_archive.sqlite3')
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from game.archive import archive_cutoff, archive_games  # noqa: E402
+from game.models import ArchivedGame, Game, Move  # noqa: E402
+from game.movelog import pack_cells, pack_times  # noqa: E402
+from game.views import GameViewSet, MatchHistoryView  # noqa: E402
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+# One game in 200 is still being played
+ONGOING_EVERY = 200
+MOVES = [0, 4, 1, 3, 2]
+
+
+def seed():
+    veteran = User.objects.create(username='veteran')
+    opponents = User.objects.bulk_create(User(username=f'opponent{i}') for i in range(100))
+    start = timezone.now() - timedelta(days=365)
+    times = pack_times([start] * len(MOVES))
+    batch = []
+    for i in range(GAMES):
+        opponent = opponents[i % len(opponents)]
+        ongoing = i % ONGOING_EVERY == 0
+        batch.append(Game(player1=veteran, player2=opponent, current_turn=veteran, board='XXXOO....',
+                          status='ongoing' if ongoing else 'completed', winner=None if ongoing else veteran,
+                          version=len(MOVES), move_log=pack_cells(MOVES, 9), move_times=times))
+        if len(batch) == 5000:
+            Game.objects.bulk_create(batch)
+            batch = []
+    Game.objects.bulk_create(batch)
+    Move.objects.bulk_create(
+        Move(game_id=game_id, player_id=veteran.id, position_x=0, position_y=0)
+        for game_id in Game.objects.values_list('id', flat=True)
+    )
+    # auto_now ignores explicit values: spread created_at over the year and
+    # leave the newest tenth of the games inside the archive window
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE game_game SET created_at = %s', [start])
+        cursor.execute(f"UPDATE game_game SET created_at = datetime(created_at, '+' || "
+                       f"(id * {365 * 86400 // GAMES}) || ' seconds')")
+        cursor.execute('UPDATE game_game SET updated_at = created_at')
+    return veteran
+
+
+def page_timings(veteran):
+    factory = APIRequestFactory()
+    views = (('ongoing', GameViewSet.as_view({'get': 'list'}), '/api/games/?status=ongoing'),
+             ('history', MatchHistoryView.as_view(), '/api/match-history/'))
+    timings = {}
+    for name, view, url in views:
+        def fetch():
+            request = factory.get(url)
+            force_authenticate(request, veteran)
+            response = view(request)
+            assert response.status_code == 200, response.data
+            response.render()
+        timings[name] = timed(fetch, repeat=50)
+    return timings
+
+
+def main():
+    veteran = seed()
+    before = page_timings(veteran)
+
+    start = time.perf_counter()
+    archived = archive_games(archive_cutoff())
+    elapsed = time.perf_counter() - start
+    print(f'{GAMES} games: archived {archived} in {elapsed:.1f}s ({archived / elapsed:,.0f}/s), '
+          f'{Game.objects.count()} left live, {ArchivedGame.objects.count()} archived')
+
+    after = page_timings(veteran)
+    for name in before:
+        print(f'{name:>8}: {before[name] * 1e3:6.2f} ms before, {after[name] * 1e3:6.2f} ms after')
+
+
+if __name__ == '__main__':
+    main()
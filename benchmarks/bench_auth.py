@@ -0,0 +1,79 @@
+"""
+Queries and time per request on the make_move and retrieve paths with
+SimpleJWT's JWTAuthentication, which loads the user on every request,
+against CachedJWTAuthentication, which serves it from the in-process cache.
+
+Run from the project root:
+    python benchmarks/bench_auth.py [requests]
+"""
+import sys
+import time
+
+from common import setup_django
+
+setup_django('bench_auth.sqlite3')
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from rest_framework.views import APIView  # noqa: E402
+from rest_framework_simplejwt.authentication import JWTAuthentication  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from game.authentication import CachedJWTAuthentication, user_cache  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+# Every timed make_move opens a fresh game, so none of them finishes one
+MOVE_REQUESTS = 200
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+def run(alice, bob):
+    clients = (client_for(alice), client_for(bob))
+    game_ids = [clients[0].post('/api/games/', {'player2_id': bob.id}, format='json').data['id']
+                for _ in range(MOVE_REQUESTS + 3)]
+
+    def make_move(turn):
+        return clients[0].post(f'/api/games/{game_ids[turn]}/make_move/',
+                               {'position_x': 1, 'position_y': 1}, format='json')
+
+    def retrieve(turn):
+        return clients[turn % 2].get(f'/api/games/{game_ids[0]}/')
+
+    results = {}
+    for name, request in (('make_move', make_move), ('retrieve', retrieve)):
+        count = MOVE_REQUESTS if name == 'make_move' else REQUESTS
+        request(0)  # warm up
+        with CaptureQueriesContext(connection) as queries:
+            request(2)
+        # Counted straight away: the next request's request_started resets the log
+        total_queries = len(queries)
+        user_queries = sum('FROM "auth_user"' in query['sql'] for query in queries)
+        start = time.perf_counter()
+        for turn in range(3, count + 3):
+            assert request(turn).status_code == 200
+        elapsed = time.perf_counter() - start
+        results[name] = (total_queries, user_queries, elapsed / count)
+    return results
+
+
+def main():
+    alice = User.objects.create_user('alice')
+    bob = User.objects.create_user('bob')
+    print(f"{'':>22}{'queries':>9}{'user':>6}{'per request':>14}")
+    for authentication in (JWTAuthentication, CachedJWTAuthentication):
+        APIView.authentication_classes = [authentication]
+        user_cache.clear()
+        for name, (queries, user_queries, seconds) in run(alice, bob).items():
+            label = f'{authentication.__name__[:-len("Authentication")]} {name}'
+            print(f'{label:>22}{queries:>9}{user_queries:>6}{seconds * 1e3:>11.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Board storage compared: the old JSON list-of-lists column against the
+encoded board string, for the per-row work of loading a board, serializing
+it for the API and writing it back, plus the stored size and a position
+search through the board index.
+
+Run from the project root:
+    python benchmarks/bench_board_encoding.py [games]
+"""
+import json
+import random
+import sys
+import time
+
+from common import setup_django, timed
+
+setup_django('bench_board_encoding.sqlite3')
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from game.engine import Position, get_rules  # noqa: E402
+from game.fields import Board  # noqa: E402
+from game.models import Game  # noqa: E402
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+
+def random_position(rules, moves, rng):
+    position = Position(rules=rules)
+    for index in rng.sample(range(rules.cells), moves):
+        position = position.play(index, position.to_move())
+    return position
+
+
+def per_row(size, count=20000):
+    rules = get_rules(size, min(size, 5))
+    position = random_position(rules, size * size // 2, random.Random(size))
+    lists = position.to_board()
+    stored_json = json.dumps(lists)
+    stored_encoded = position.to_string()
+
+    # Old column: json.loads on every row read, lists as-is for the API,
+    # json.dumps when a move is saved
+    json_load = timed(lambda: [json.loads(stored_json) for _ in range(count)])
+    json_write = timed(lambda: [json.dumps(lists) for _ in range(count)])
+    # New column: the row holds the string; lists are only built to serialize
+    encoded_load = timed(lambda: [Board(stored_encoded) for _ in range(count)])
+    encoded_api = timed(lambda: [Board(stored_encoded).to_lists() for _ in range(count)])
+    encoded_write = timed(lambda: [position.to_string() for _ in range(count)])
+    print(f'{size}x{size}: stored {len(stored_json)} bytes as JSON, {len(stored_encoded)} encoded')
+    print(f'  load:           json {json_load / count * 1e6:6.2f} us   encoded {encoded_load / count * 1e6:6.2f} us')
+    print(f'  load + to API:  json {json_load / count * 1e6:6.2f} us   encoded {encoded_api / count * 1e6:6.2f} us')
+    print(f'  write:          json {json_write / count * 1e6:6.2f} us   encoded {encoded_write / count * 1e6:6.2f} us')
+
+
+def position_search():
+    alice = User.objects.create_user('alice')
+    bob = User.objects.create_user('bob')
+    rules = get_rules(3, 3)
+    rng = random.Random(0)
+    Game.objects.bulk_create(
+        Game(player1=alice, player2=bob, current_turn=alice, board=random_position(rules, 4, rng).to_string())
+        for _ in range(GAMES)
+    )
+    board = Game.objects.values_list('board', flat=True).first()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN SELECT id FROM game_game WHERE board = %s', [str(board)])
+        plan = ' / '.join(row[-1] for row in cursor.fetchall())
+    exact = timed(lambda: list(Game.objects.filter(board=board).values_list('id', flat=True)), repeat=50)
+    symmetric = timed(lambda: list(Game.objects.filter(board__in=board.symmetries()).values_list('id', flat=True)),
+                      repeat=50)
+    print(f'search among {GAMES} games ({plan}):')
+    print(f'  exact {exact * 1e3:.2f} ms, with symmetries {symmetric * 1e3:.2f} ms')
+
+
+def main():
+    start = time.perf_counter()
+    for size in (3, 15):
+        per_row(size)
+    position_search()
+    print(f'total {time.perf_counter() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
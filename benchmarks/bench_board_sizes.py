@@ -0,0 +1,76 @@
+"""
+Per-move win detection cost on 3x3, 15x15 and 19x19 boards: a full scan of
+every winning line against the incremental walk through the last move.
+
+Run from the project root:
+    python benchmarks/bench_board_sizes.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.engine import O, X, Position, get_rules  # noqa: E402
+
+VARIANTS = ((3, 3, 20000), (15, 5, 400), (19, 5, 200))
+
+
+def random_games(rules, count, seed=0):
+    """Random legal move sequences, each stopped at the first win or draw."""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        position = Position(rules=rules)
+        symbol = X
+        moves = []
+        while True:
+            index = rng.choice(position.legal_moves())
+            position = position.play(index, symbol)
+            moves.append(index)
+            if position.is_winning_move(index, symbol) or position.is_full():
+                break
+            symbol = O if symbol == X else X
+        games.append(moves)
+    return games
+
+
+def play(rules, games, incremental):
+    for moves in games:
+        position = Position(rules=rules)
+        symbol = X
+        for index in moves:
+            position = position.play(index, symbol)
+            if incremental:
+                won = position.is_winning_move(index, symbol)
+            else:
+                won = position.has_won(symbol)
+            if won or position.is_full():
+                break
+            symbol = O if symbol == X else X
+
+
+def bench(rules, games, incremental, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        play(rules, games, incremental)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'board':<14}{'lines':>7}{'moves':>9}{'full scan':>14}{'incremental':>14}{'speedup':>9}")
+    for size, win_length, count in VARIANTS:
+        rules = get_rules(size, win_length)
+        games = random_games(rules, count)
+        total = sum(len(moves) for moves in games)
+        full = bench(rules, games, incremental=False) / total * 1e6
+        incremental = bench(rules, games, incremental=True) / total * 1e6
+        print(f"{size}x{size}, k={win_length:<5}{len(rules.win_masks):>7}{total:>9}"
+              f"{full:>11.2f} us{incremental:>11.2f} us{full / incremental:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Cost of a computer reply: the tablebase lookup on 3x3 against the
+alpha-beta search on larger boards, plus what building and mapping the
+tablebase file costs.
+
+Run from the project root:
+    python benchmarks/bench_bot.py
+"""
+import os
+import random
+import tempfile
+import time
+
+from common import setup_django
+
+setup_django('bench_bot.sqlite3', migrate=False)
+
+from game.ai import choose_move  # noqa: E402
+from game.engine import O, X, Position, get_rules  # noqa: E402
+from game.tablebase import Tablebase, tablebase, write_tablebase  # noqa: E402
+
+
+def random_positions(rules, count, plies, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position, symbol = Position(rules=rules), X
+        for _ in range(plies):
+            index = rng.choice(position.legal_moves())
+            position = position.play(index, symbol)
+            if position.is_over():
+                break
+            symbol = O if symbol == X else X
+        else:
+            positions.append(position)
+    return positions
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tablebase.bin')
+        start = time.perf_counter()
+        write_tablebase(path)
+        print(f'3x3 tablebase solved and written in {(time.perf_counter() - start) * 1e3:.1f} ms')
+        start = time.perf_counter()
+        Tablebase(path).best_move(0, 0)
+        print(f'3x3 tablebase mapped in {(time.perf_counter() - start) * 1e3:.2f} ms')
+    tablebase.best_move(0, 0)  # Load the shared one before timing lookups
+
+    positions = random_positions(get_rules(), 5000, 3)
+    start = time.perf_counter()
+    for position in positions:
+        choose_move(position)
+    print(f'3x3 lookup: {(time.perf_counter() - start) / len(positions) * 1e6:.2f} us per reply')
+
+    for size, win_length in ((7, 4), (15, 5), (19, 5)):
+        positions = random_positions(get_rules(size, win_length), 5, 6)
+        start = time.perf_counter()
+        for position in positions:
+            choose_move(position, time_budget=1.0, max_depth=4)
+        print(f'{size}x{size}, k={win_length}: {(time.perf_counter() - start) / len(positions) * 1e3:.0f} ms per reply')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Moves per second of the bitboard engine against the closure-based checks
+that make_move used to define on every request.
+
+Run from the project root:
+    python benchmarks/bench_engine.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.engine import Position, cell_index  # noqa: E402
+
+GAMES = 20000
+
+
+def random_games(count, seed=0):
+    """Random legal move sequences, each stopped at the first win or draw."""
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        position = Position()
+        symbol = 'X'
+        moves = []
+        while not position.is_over():
+            index = rng.choice(position.legal_moves())
+            position = position.play(index, symbol)
+            moves.append(divmod(index, 3))
+            symbol = 'O' if symbol == 'X' else 'X'
+        games.append(moves)
+    return games
+
+
+def play_closures(moves):
+    board = [[None, None, None] for _ in range(3)]
+    symbol = 'X'
+    for x, y in moves:
+        if board[x][y] is not None:
+            raise ValueError('Position already taken')
+        board[x][y] = symbol
+
+        def check_winner():
+            for i in range(3):
+                if board[i][0] == board[i][1] == board[i][2] and board[i][0] is not None:
+                    return True
+            for i in range(3):
+                if board[0][i] == board[1][i] == board[2][i] and board[0][i] is not None:
+                    return True
+            if board[0][0] == board[1][1] == board[2][2] and board[0][0] is not None:
+                return True
+            if board[0][2] == board[1][1] == board[2][0] and board[0][2] is not None:
+                return True
+            return False
+
+        def is_board_full():
+            return all(cell is not None for row in board for cell in row)
+
+        if check_winner() or is_board_full():
+            return
+        symbol = 'O' if symbol == 'X' else 'X'
+
+
+def play_engine_from_board(moves):
+    # Mirrors make_move: decode the stored board, apply, encode it back
+    board = Position().to_board()
+    symbol = 'X'
+    for x, y in moves:
+        position = Position.from_board(board)
+        index = cell_index(x, y)
+        if not position.is_empty(index):
+            raise ValueError('Position already taken')
+        position = position.play(index, symbol)
+        board = position.to_board()
+        if position.has_won(symbol) or position.is_full():
+            return
+        symbol = 'O' if symbol == 'X' else 'X'
+
+
+def play_engine_masks(moves):
+    position = Position()
+    symbol = 'X'
+    for x, y in moves:
+        index = cell_index(x, y)
+        if not position.is_empty(index):
+            raise ValueError('Position already taken')
+        position = position.play(index, symbol)
+        if position.has_won(symbol) or position.is_full():
+            return
+        symbol = 'O' if symbol == 'X' else 'X'
+
+
+def bench(name, play, games, total_moves, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for moves in games:
+            play(moves)
+        best = min(best, time.perf_counter() - start)
+    rate = total_moves / best
+    print(f"{name:<28} {rate:>12,.0f} moves/s")
+    return rate
+
+
+def main():
+    games = random_games(GAMES)
+    total_moves = sum(len(moves) for moves in games)
+    print(f"{GAMES} random games, {total_moves} moves\n")
+    baseline = bench('closures (old make_move)', play_closures, games, total_moves)
+    for name, play in (('engine, board round-trip', play_engine_from_board),
+                       ('engine, masks only', play_engine_masks)):
+        rate = bench(name, play, games, total_moves)
+        print(f"{'':<28} {rate / baseline:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Peak memory and throughput of the NDJSON export as the games table grows:
+memory should stay flat because games and their moves are streamed a chunk
+at a time.
+
+Run from the project root:
+    python benchmarks/bench_export.py
+"""
+import time
+import tracemalloc
+
+from common import setup_django
+
+setup_django('bench_export.sqlite3')
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from game.export import export_querysets, iter_ndjson  # noqa: E402
+from game.models import Game, Move  # noqa: E402
+
+SIZES = (2_000, 10_000, 30_000)
+MOVES_PER_GAME = 5
+
+
+def seed(total, players):
+    existing = Game.objects.count()
+    games = Game.objects.bulk_create(
+        Game(player1=players[0], player2=players[1], current_turn=players[0], status='completed',
+             winner=players[0], board=[])
+        for _ in range(total - existing)
+    )
+    Move.objects.bulk_create(
+        Move(game=game, player=players[i % 2], position_x=i // 3, position_y=i % 3)
+        for game in games for i in range(MOVES_PER_GAME)
+    )
+
+
+def main():
+    players = [User.objects.create(username='alice'), User.objects.create(username='bob')]
+    print(f"{'games':>8}{'seconds':>10}{'games/s':>10}{'peak MB':>10}")
+    for total in SIZES:
+        seed(total, players)
+        tracemalloc.start()
+        start = time.perf_counter()
+        exported = sum(1 for _ in iter_ndjson(export_querysets()))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert exported == total
+        print(f"{total:>8}{elapsed:>10.2f}{total / elapsed:>10,.0f}{peak / 2 ** 20:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+import_games throughput: random legal 3x3 games between a pool of players,
+written as NDJSON and loaded with bulk_create batches.
+
+Run from the project root:
+    python benchmarks/bench_import.py [games]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import setup_django
+
+setup_django('bench_import.sqlite3')
+
+from django.core.management import call_command  # noqa: E402
+
+from game.engine import Position, get_rules  # noqa: E402
+from game.models import Game, Move  # noqa: E402
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+PLAYERS = 1000
+
+
+def write_corpus(path, seed=0):
+    rng = random.Random(seed)
+    rules = get_rules()
+    with open(path, 'w') as handle:
+        for _ in range(GAMES):
+            player1, player2 = rng.sample(range(PLAYERS), 2)
+            position, symbol, moves = Position(rules=rules), 'X', []
+            while True:
+                index = rng.choice(position.legal_moves())
+                position = position.play(index, symbol)
+                moves.append({'x': index // 3, 'y': index % 3})
+                if position.is_winning_move(index, symbol) or position.is_full():
+                    break
+                symbol = 'O' if symbol == 'X' else 'X'
+            handle.write(json.dumps({'player1': f'player{player1}', 'player2': f'player{player2}',
+                                     'moves': moves}) + '\n')
+
+
+def main():
+    path = os.path.join(tempfile.gettempdir(), 'bench_import.ndjson')
+    write_corpus(path)
+    start = time.perf_counter()
+    call_command('import_games', path, '--create-users', '--batch-size', '2000')
+    elapsed = time.perf_counter() - start
+    print(f'{Game.objects.count()} games, {Move.objects.count()} moves in {elapsed:.1f}s: '
+          f'{GAMES / elapsed:,.0f} games/s, {1_000_000 / (GAMES / elapsed) / 60:.1f} min per million')
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Leaderboard cost with a large profile table: initial load from the ranking
+index, then top-N, rank lookups and in-place updates.
+
+Run from the project root:
+    python benchmarks/bench_leaderboard.py [profiles]
+"""
+import random
+import sys
+import time
+
+from common import setup_django, timed
+
+setup_django('bench_leaderboard.sqlite3')
+
+from django.db import connection, transaction  # noqa: E402
+
+from game.leaderboard import Leaderboard  # noqa: E402
+from game.rating import INITIAL_RATING  # noqa: E402
+
+PROFILES = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+
+def seed():
+    """Insert PROFILES users and profiles; returns their ids, above any the migrations created."""
+    rng = random.Random(0)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM auth_user')
+        first = cursor.fetchone()[0] + 1
+        ids = range(first, first + PROFILES)
+        cursor.executemany(
+            "INSERT INTO auth_user (id, password, is_superuser, username, first_name, last_name, email,"
+            " is_staff, is_active, date_joined) VALUES (%s, '', 0, %s, '', '', '', 0, 1, '2024-01-01')",
+            [(i, f'player{i}') for i in ids])
+        cursor.executemany(
+            "INSERT INTO game_userprofile (user_id, bio, games_played, games_won, games_lost, games_drawn,"
+            " rating, created_at, updated_at) VALUES (%s, '', %s, %s, 0, 0, %s, '2024-01-01', '2024-01-01')",
+            [(i, wins, wins, INITIAL_RATING + wins)
+             for i, wins in ((i, int(rng.expovariate(0.05))) for i in ids)])
+    return ids
+
+
+def main():
+    start = time.perf_counter()
+    ids = seed()
+    print(f"seeded {PROFILES:,} profiles in {time.perf_counter() - start:.1f}s\n")
+
+    board = Leaderboard(ttl=3600)
+    start = time.perf_counter()
+    len(board)
+    print(f"initial load            {(time.perf_counter() - start) * 1000:>10.1f} ms (once per worker/TTL)")
+
+    rng = random.Random(1)
+    scores = [INITIAL_RATING + rng.randrange(0, 100) for _ in range(1000)]
+    print(f"top 10                  {timed(lambda: board.top(10)) * 1e6:>10.1f} us")
+    print(f"top 100                 {timed(lambda: board.top(100)) * 1e6:>10.1f} us")
+    rank = timed(lambda: [board.rank_of_score(score) for score in scores]) / len(scores)
+    print(f"rank lookup             {rank * 1e6:>10.2f} us")
+    users = [rng.choice(ids) for _ in range(1000)]
+    start = time.perf_counter()
+    for user_id in users:
+        board.update(user_id, INITIAL_RATING + 16)
+    print(f"update after a win      {(time.perf_counter() - start) / len(users) * 1e6:>10.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Move storage modes compared: one Move row per move ('rows') against the
+packed Game.move_log ('log'), for make_move writes and for reading games
+with their moves (?expand=moves, 20 games per page).
+
+Run from the project root:
+    python benchmarks/bench_move_log.py [games]
+"""
+import sys
+import time
+
+from common import setup_django, timed
+
+setup_django('bench_move_log.sqlite3')
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, reset_queries  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from game.models import Game, Move  # noqa: E402
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+# A drawn 3x3 game: all nine cells, so nine writes per game
+MOVES = [(0, 0), (1, 1), (0, 1), (0, 2), (2, 0), (1, 0), (1, 2), (2, 1), (2, 2)]
+
+
+def play_games(clients, opponent):
+    ids = []
+    for _ in range(GAMES):
+        game_id = clients[0].post('/api/games/', {'player2_id': opponent.id}, format='json').data['id']
+        for turn, (x, y) in enumerate(MOVES):
+            response = clients[turn % 2].post(f'/api/games/{game_id}/make_move/',
+                                              {'position_x': x, 'position_y': y}, format='json')
+            assert response.status_code == 200, response.data
+        ids.append(game_id)
+    return ids
+
+
+def main():
+    alice, bob = User.objects.create_user('alice'), User.objects.create_user('bob')
+    clients = [APIClient(), APIClient()]
+    clients[0].force_authenticate(alice)
+    clients[1].force_authenticate(bob)
+
+    print(f"{'mode':<6}{'make_move':>12}{'read page':>12}{'queries':>9}{'Move rows':>11}")
+    for mode in ('rows', 'log'):
+        settings.GAME_MOVE_STORAGE = mode
+        Game.objects.all().delete()
+        start = time.perf_counter()
+        play_games(clients, bob)
+        write = (time.perf_counter() - start) / (GAMES * len(MOVES))
+
+        def read():
+            response = clients[0].get('/api/games/?expand=moves')
+            assert len(response.data['results']) == 20
+
+        settings.DEBUG = True
+        reset_queries()
+        read()
+        queries = len(connection.queries)
+        settings.DEBUG = False
+        print(f"{mode:<6}{write * 1e3:>9.2f} ms{timed(read, repeat=20) * 1e3:>9.2f} ms"
+              f"{queries:>9}{Move.objects.count():>11}")
+
+
+if __name__ == '__main__':
+    main()
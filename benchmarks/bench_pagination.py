@@ -0,0 +1,81 @@
+"""
+Time per page of match history for a veteran user, keyset cursors against
+OFFSET paging over the same OR-filtered query.
+
+Run from the project root:
+    python benchmarks/bench_pagination.py [games]
+"""
+import sys
+from datetime import timedelta
+
+from common import setup_django, timed
+
+setup_django('bench_pagination.sqlite3')
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from game.models import Game  # noqa: E402
+from game.pagination import KeysetPagination  # noqa: E402
+from game.views import MatchHistoryView  # noqa: E402
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+PAGE_SIZE = KeysetPagination.page_size
+PAGES = (1, 100, 500, GAMES // PAGE_SIZE)
+
+
+def seed():
+    veteran = User.objects.create(username='veteran')
+    opponents = User.objects.bulk_create(User(username=f'opponent{i}') for i in range(100))
+    start = timezone.now() - timedelta(days=365)
+    batch = []
+    for i in range(GAMES):
+        opponent = opponents[i % len(opponents)]
+        first, second = (veteran, opponent) if i % 2 else (opponent, veteran)
+        batch.append(Game(player1=first, player2=second, current_turn=first, status='completed',
+                          winner=first if i % 3 else None, board=[]))
+        if len(batch) == 5000:
+            Game.objects.bulk_create(batch)
+            batch = []
+    Game.objects.bulk_create(batch)
+    # auto_now_add ignores explicit values, so spread created_at afterwards
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE game_game SET created_at = %s', [start])
+        cursor.execute("UPDATE game_game SET created_at = datetime(created_at, '+' || (id * 60) || ' seconds')")
+    return veteran
+
+
+def main():
+    veteran = seed()
+    factory = APIRequestFactory()
+    view = MatchHistoryView.as_view()
+    history = Game.objects.filter(Q(player1=veteran) | Q(player2=veteran)).order_by('-created_at', '-id')
+
+    print(f"{GAMES} games, {PAGE_SIZE} per page\n")
+    print(f"{'page':>8}{'keyset':>12}{'offset':>12}")
+    for page in PAGES:
+        cursor = None
+        if page > 1:
+            cursor = KeysetPagination.encode_cursor(history[(page - 1) * PAGE_SIZE - 1])
+        url = '/api/match-history/' + (f'?cursor={cursor}' if cursor else '')
+
+        def keyset():
+            request = factory.get(url)
+            force_authenticate(request, veteran)
+            response = view(request)
+            assert response.status_code == 200 and len(response.data['results']) == PAGE_SIZE
+            response.render()
+
+        def offset():
+            rows = list(history.select_related('player1', 'player2', 'winner')
+                        [(page - 1) * PAGE_SIZE:page * PAGE_SIZE])
+            assert len(rows) == PAGE_SIZE
+
+        print(f"{page:>8}{timed(keyset) * 1000:>9.2f} ms{timed(offset) * 1000:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Concurrent read/write throughput with SQLite's stock settings against the
+production profile (WAL, synchronous=NORMAL, busy timeout, mmap, cache).
+
+Writer processes apply moves the way make_move does (conditional game
+UPDATE, Move INSERT, one transaction); reader processes page through match
+history. Each profile runs in fresh processes on a fresh database file.
+
+Run from the project root:
+    python benchmarks/bench_sqlite_profile.py [seconds] [writers] [readers]
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+WRITERS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+READERS = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+GAMES = 200
+
+
+def worker(role, db_name, barrier, results):
+    from common import setup_django
+    setup_django(db_name, migrate=False, fresh=False)
+
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection, transaction
+
+    from game.models import Game, Move
+    from game.archive import history_branches
+
+    users = list(User.objects.order_by('id'))
+    game_ids = list(Game.objects.values_list('id', flat=True))
+    ops = errors = 0
+    latencies = []
+    barrier.wait()
+    deadline = time.time() + SECONDS
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            if role == 'write':
+                game = Game.objects.get(pk=game_ids[ops % len(game_ids)])
+                with transaction.atomic():
+                    if game.save_if_current(board=game.board):
+                        Move.objects.create(game=game, player=users[0], position_x=0, position_y=0)
+            else:
+                for queryset in history_branches(users[ops % len(users)]):
+                    list(queryset.order_by('-created_at', '-id')[:20])
+            ops += 1
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors += 1
+    connection.close()
+    results.put((role, ops, errors, latencies))
+
+
+def run_profile(profile):
+    os.environ['TICTACTOE_DB_PROFILE'] = profile
+    db_name = f'bench_sqlite_{profile}.sqlite3'
+    context = multiprocessing.get_context('spawn')
+    # Seed in a child too, so every process reads the profile from a fresh settings import
+    seeder = context.Process(target=seed, args=(db_name,))
+    seeder.start()
+    seeder.join()
+    results = context.Queue()
+    roles = ['write'] * WRITERS + ['read'] * READERS
+    barrier = context.Barrier(len(roles))
+    processes = [context.Process(target=worker, args=(role, db_name, barrier, results)) for role in roles]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    print(f"\n{profile} profile ({WRITERS} writers, {READERS} readers, {SECONDS:.0f}s)")
+    for role in ('write', 'read'):
+        rows = [r for r in collected if r[0] == role]
+        ops = sum(r[1] for r in rows)
+        errors = sum(r[2] for r in rows)
+        latencies = sorted(x for r in rows for x in r[3])
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+        print(f"  {role:<6}{ops / SECONDS:>10,.0f} ops/s   p99 {p99:>8.2f} ms   locked errors {errors}")
+
+
+def seed(db_name):
+    from common import setup_django
+    setup_django(db_name)
+    from django.contrib.auth.models import User
+    from game.models import Game
+    users = User.objects.bulk_create(User(username=f'player{i}') for i in range(20))
+    Game.objects.bulk_create(
+        Game(player1=users[i % 20], player2=users[(i + 1) % 20], current_turn=users[i % 20],
+             board=[[None] * 3 for _ in range(3)])
+        for i in range(GAMES)
+    )
+
+
+if __name__ == '__main__':
+    for profile in ('default', 'production'):
+        run_profile(profile)
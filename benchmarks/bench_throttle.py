@@ -0,0 +1,72 @@
+"""
+Per-request cost of the token-bucket throttle: BucketThrottle.allow_request
+against the in-process store and the shared SQLite store, over many
+clients, plus the eviction sweep of the in-process store.
+
+Run from the project root:
+    python benchmarks/bench_throttle.py [requests] [clients]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from common import setup_django
+
+setup_django('bench_throttle.sqlite3')
+
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from game.throttling import IPBucketThrottle, MemoryBucketStore, bucket_store  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+CLIENTS = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+
+class View:
+    throttle_scope = 'bench'
+
+
+def requests():
+    factory = APIRequestFactory()
+    built = []
+    for i in range(CLIENTS):
+        request = Request(factory.post('/api/token/', REMOTE_ADDR=f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'))
+        request.user = AnonymousUser()
+        built.append(request)
+    return built
+
+
+def run(label, count, clients):
+    view, throttle = View(), IPBucketThrottle()
+    start = time.perf_counter()
+    for i in range(count):
+        throttle.allow_request(clients[i % len(clients)], view)
+    elapsed = time.perf_counter() - start
+    print(f'{label:>8}: {elapsed / count * 1e6:7.2f} us per request ({count:,} requests, {len(clients):,} clients)')
+
+
+def main():
+    clients = requests()
+    rates = {'DEFAULT_THROTTLE_RATES': {'bench': '100/s'}}
+    with override_settings(REST_FRAMEWORK=rates, THROTTLE_STORE='memory'):
+        run('memory', REQUESTS, clients)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'throttle.sqlite3')
+        with override_settings(REST_FRAMEWORK=rates, THROTTLE_STORE='sqlite', THROTTLE_SQLITE_PATH=path):
+            run('sqlite', REQUESTS // 10, clients)
+            bucket_store()._connection().close()
+
+    store = MemoryBucketStore(evict_interval=3600)
+    for i in range(100_000):
+        store.take(i, 10, 1.0)
+    start = time.perf_counter()
+    store.evict(time.monotonic() + 60)
+    print(f'   sweep: {(time.perf_counter() - start) * 1e3:.1f} ms for 100,000 idle buckets, {len(store)} left')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Load test of /api/token/ (login), with and without the old receiver that
+saved the profile on every User save, and of GET /api/profile/me/, which
+now reads the profile in one query (it was get_or_create plus a query for
+the profile's user).
+
+Logins only save the user (last_login) with SIMPLE_JWT's UPDATE_LAST_LOGIN,
+so the run turns it on. Password hashing would otherwise dominate every
+login, so users get the fast MD5 hasher unless --pbkdf2 is passed; the
+absolute gain is the same, only its share of a login changes.
+
+Run from the project root:
+    python benchmarks/bench_token.py [logins] [--pbkdf2]
+"""
+import sys
+import time
+
+from common import setup_django
+
+setup_django('bench_token.sqlite3')
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models.signals import post_save  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+PBKDF2 = '--pbkdf2' in sys.argv
+ARGS = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+LOGINS = int(ARGS[0]) if ARGS else (50 if PBKDF2 else 2000)
+USERS = 100
+HASHERS = settings.PASSWORD_HASHERS if PBKDF2 else ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def save_user_profile(sender, instance, **kwargs):
+    """The receiver removed from game.models: a profile SELECT and UPDATE per User save."""
+    instance.profile.save()
+
+
+def measure(count, request):
+    request(0)  # warm up, e.g. the authentication cache
+    with CaptureQueriesContext(connection) as queries:
+        request(0)
+    # Counted straight away: the next request's request_started resets the log
+    query_count = len(queries)
+    start = time.perf_counter()
+    for i in range(count):
+        request(i)
+    return query_count, count / (time.perf_counter() - start)
+
+
+client = APIClient()
+
+
+def login(i):
+    response = client.post('/api/token/', {'username': f'player{i % USERS}', 'password': 'secret'},
+                           format='json')
+    assert response.status_code == 200, response.data
+    return response.data['access']
+
+
+def main():
+    jwt_settings = {**getattr(settings, 'SIMPLE_JWT', {}), 'UPDATE_LAST_LOGIN': True}
+    with override_settings(PASSWORD_HASHERS=HASHERS, SIMPLE_JWT=jwt_settings):
+        for i in range(USERS):
+            User.objects.create_user(f'player{i}', password='secret')
+
+        print(f"{LOGINS} requests per endpoint, {'PBKDF2' if PBKDF2 else 'MD5'} password hashing\n")
+        for label, connected in (('before', True), ('after', False)):
+            if connected:
+                post_save.connect(save_user_profile, sender=User)
+            try:
+                queries, rate = measure(LOGINS, login)
+            finally:
+                post_save.disconnect(save_user_profile, sender=User)
+            print(f'login {label:>6}: {queries} queries, {rate:,.0f} logins/s')
+
+        me_client = APIClient()
+        me_client.credentials(HTTP_AUTHORIZATION=f'Bearer {login(0)}')
+        queries, rate = measure(LOGINS, lambda i: me_client.get('/api/profile/me/'))
+        print(f'profile/me:   {queries} queries, {rate:,.0f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmarks that need a configured Django project."""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def setup_django(db_name='bench.sqlite3', migrate=True, fresh=True):
+    """
+    Configure Django against a scratch SQLite file in the temp directory, so
+    benchmarks never touch db.sqlite3, with no scope throttled, so one client
+    can send as many requests as it likes. Returns the database path.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tictactoe.settings')
+    import django
+    from django.conf import settings
+
+    path = os.path.join(tempfile.gettempdir(), db_name)
+    for suffix in ('', '-wal', '-shm'):
+        if fresh and os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    settings.DATABASES['default']['NAME'] = path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+    django.setup()
+    # TICTACTOE_DISABLE_THROTTLING is refused with DEBUG off, so the rates
+    # are emptied here; override_settings also resets DRF's cached settings
+    from django.test.utils import override_settings
+    override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}).enable()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+    return path
+
+
+def timed(func, repeat=5):
+    """Best wall-clock time of func() over repeat runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Game, Move, UserProfile
+from .models import ArchivedGame, Game, MatchmakingEntry, Move, UserProfile
 
 # Register your models here.
 
@@ -10,6 +10,12 @@ class GameAdmin(admin.ModelAdmin):
     search_fields = ('player1__username', 'player2__username')
     date_hierarchy = 'created_at'
 
+@admin.register(ArchivedGame)
+class ArchivedGameAdmin(admin.ModelAdmin):
+    list_display = ('id', 'player1', 'player2', 'winner', 'created_at', 'archived_at')
+    search_fields = ('player1__username', 'player2__username')
+    date_hierarchy = 'created_at'
+
 @admin.register(Move)
 class MoveAdmin(admin.ModelAdmin):
     list_display = ('id', 'game', 'player', 'position_x', 'position_y', 'created_at')
@@ -18,5 +24,11 @@ class MoveAdmin(admin.ModelAdmin):
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'games_played', 'games_won', 'games_lost', 'games_drawn')
+    list_display = ('user', 'rating', 'games_played', 'games_won', 'games_lost', 'games_drawn')
+    search_fields = ('user__username',)
+
+
+@admin.register(MatchmakingEntry)
+class MatchmakingEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'rating', 'game', 'created_at')
     search_fields = ('user__username',)
@@ -0,0 +1,178 @@
+"""
+Computer opponent.
+
+Replies on the classic 3x3 board come from the memory-mapped tablebase, so
+each is a single lookup. Larger boards are searched with iterative-deepening
+alpha-beta, a transposition table and a per-move time budget.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .engine import X, iter_bits
+from .tablebase import tablebase
+
+
+# The computer player, created by migration 0008; make_move answers for it
+BOT_USERNAME = 'computer'
+
+
+def is_bot(user):
+    return user is not None and user.username == BOT_USERNAME
+
+
+def bot_user_id():
+    """Primary key of the computer player, or None if it does not exist."""
+    return User.objects.filter(username=BOT_USERNAME).values_list('id', flat=True).first()
+
+
+# Weight of a line holding n stones of one player and none of the other
+LINE_WEIGHTS = (0, 1, 8, 64, 512, 4096, 32768, 262144, 2097152)
+WIN_SCORE = 1 << 40
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBeta:
+    """
+    Depth-limited negamax with alpha-beta pruning for N x N, k-in-a-row.
+
+    Only empty cells next to a stone are searched, best-looking first. The
+    evaluation sums LINE_WEIGHTS over every winning line still open to one
+    player and is updated incrementally from the lines through each played
+    cell, so a node costs O(k) rather than a scan of every line.
+    """
+    max_candidates = 12
+
+    def __init__(self, rules, deadline, max_depth):
+        self.rules = rules
+        self.deadline = deadline
+        self.max_depth = max_depth
+        self.table = {}
+        self.nodes = 0
+        self.lines_through, self.neighbours = _geometry(rules)
+
+    def line_score(self, line, mover, other):
+        """A line's value for the side owning mover."""
+        mine, theirs = line & mover, line & other
+        if mine and theirs:
+            return 0
+        if mine:
+            return LINE_WEIGHTS[min(bin(mine).count('1'), 8)]
+        if theirs:
+            return -LINE_WEIGHTS[min(bin(theirs).count('1'), 8)]
+        return 0
+
+    def gain(self, index, mover, other):
+        """Change in mover's evaluation from placing a stone on index."""
+        played = mover | 1 << index
+        return sum(self.line_score(line, played, other) - self.line_score(line, mover, other)
+                   for line in self.lines_through[index])
+
+    def evaluate(self, mover, other):
+        return sum(self.line_score(line, mover, other) for line in self.rules.win_masks)
+
+    def candidates(self, mover, other):
+        occupied = mover | other
+        if not occupied:
+            centre = self.rules.size // 2
+            return [self.rules.cell_index(centre, centre)]
+        near = 0
+        for index in iter_bits(occupied):
+            near |= self.neighbours[index]
+        return list(iter_bits(near & ~occupied))
+
+    def ordered(self, mover, other, first=None):
+        # A move is worth what it builds for us plus what it takes from the opponent
+        moves = sorted(self.candidates(mover, other),
+                       key=lambda i: self.gain(i, mover, other) + self.gain(i, other, mover),
+                       reverse=True)[:self.max_candidates]
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def negamax(self, mover, other, score, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 255 == 0 and time.monotonic() > self.deadline:
+            raise SearchTimeout
+        if depth == 0:
+            return score, None
+        key = (mover, other)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth and entry[1] is not None:
+            return entry[1], entry[2]
+        window_floor = alpha
+        moves = self.ordered(mover, other, entry[2] if entry else None)
+        if not moves:
+            return 0, None
+        best_score, best_move = -WIN_SCORE * 2, moves[0]
+        for index in moves:
+            played = mover | 1 << index
+            if self.rules.completes_line(played, index):
+                result = WIN_SCORE + depth
+            elif played | other == self.rules.full_mask:
+                result = 0
+            else:
+                child = -(score + self.gain(index, mover, other))
+                result = -self.negamax(other, played, child, depth - 1, -beta, -alpha)[0]
+            if result > best_score:
+                best_score, best_move = result, index
+            alpha = max(alpha, result)
+            if alpha >= beta:
+                break
+        # Bounds only help move ordering; exact scores can be reused outright
+        exact = window_floor < best_score < beta
+        self.table[key] = (depth, best_score if exact else None, best_move)
+        return best_score, best_move
+
+    def best_move(self, position):
+        mover, other = (position.x, position.o) if position.to_move() == X else (position.o, position.x)
+        moves = self.ordered(mover, other)
+        best = moves[0]
+        score = self.evaluate(mover, other)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                result, move = self.negamax(mover, other, score, depth, -WIN_SCORE * 2, WIN_SCORE * 2)
+            except SearchTimeout:
+                break
+            if move is not None:
+                best = move
+            if abs(result) >= WIN_SCORE:
+                break
+        return best
+
+
+_GEOMETRY = {}
+
+
+def _geometry(rules):
+    """Winning lines through each cell and each cell's 8 neighbours, per Rules."""
+    if rules not in _GEOMETRY:
+        lines_through = [[] for _ in range(rules.cells)]
+        for line in rules.win_masks:
+            for index in iter_bits(line):
+                lines_through[index].append(line)
+        neighbours = []
+        for index in range(rules.cells):
+            x0, y0 = rules.cell_coords(index)
+            mask = 0
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    if (dx or dy) and rules.in_bounds(x0 + dx, y0 + dy):
+                        mask |= 1 << rules.cell_index(x0 + dx, y0 + dy)
+            neighbours.append(mask)
+        _GEOMETRY[rules] = (lines_through, neighbours)
+    return _GEOMETRY[rules]
+
+
+def choose_move(position, time_budget=None, max_depth=None):
+    """Cell index the computer plays in position, which must not be finished."""
+    if position.rules.is_standard:
+        return tablebase.best_move(position.x, position.o)
+    budget = settings.BOT_MOVE_TIME if time_budget is None else time_budget
+    depth = settings.BOT_SEARCH_DEPTH if max_depth is None else max_depth
+    return AlphaBeta(position.rules, time.monotonic() + budget, depth).best_move(position)
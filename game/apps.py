@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='game.configure_sqlite')
+
+        from .authentication import invalidate_cached_user
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_cached_user, sender=settings.AUTH_USER_MODEL,
+                           dispatch_uid=f'game.invalidate_cached_user.{signal is post_save}')
+
+        from .leaderboard import profile_deleted, profile_saved
+        post_save.connect(profile_saved, sender='game.UserProfile', dispatch_uid='game.leaderboard.profile_saved')
+        post_delete.connect(profile_deleted, sender='game.UserProfile', dispatch_uid='game.leaderboard.profile_deleted')
@@ -0,0 +1,88 @@
+"""
+Archival of finished games.
+
+archive_games() moves completed games last updated before a cutoff from
+Game (and their Move rows) into ArchivedGame, which keeps each game's id
+and its moves only as the packed move log. The game tables then hold the
+ongoing games and recent history, and the indexes every make_move and
+listing walks stay small.
+
+Reads that cover a player's history merge both tables: history_branches()
+returns one queryset per table and seat for
+KeysetPagination.paginate_branches, and merged() streams both tables in
+(created_at, id) order for exports and rating replays.
+"""
+import heapq
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedGame, Game, Move
+
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVED_FIELDS = ('id', 'player1_id', 'player2_id', 'winner_id', 'board', 'size', 'win_length', 'version',
+                   'move_log', 'move_times', 'created_at', 'updated_at')
+
+
+def archive_cutoff(days=None):
+    """The updated_at before which completed games are archived."""
+    if days is None:
+        days = settings.GAME_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_batch(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to batch_size completed games last updated before before into
+    the archive, in one transaction. Returns how many were moved.
+    """
+    with transaction.atomic():
+        games = list(
+            Game.objects.filter(status='completed', updated_at__lt=before)
+            .order_by('id').values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not games:
+            return 0
+        now = timezone.now()
+        ArchivedGame.objects.bulk_create(ArchivedGame(archived_at=now, **game) for game in games)
+        ids = [game['id'] for game in games]
+        # Every move is already in the game's move_log, so the rows can go
+        Move.objects.filter(game_id__in=ids).delete()
+        Game.objects.filter(id__in=ids).delete()
+    return len(games)
+
+
+def archive_games(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive every completed game last updated before before. Each batch is
+    its own short transaction, so moves on live games are never held up for
+    long. Returns the count.
+    """
+    archived = 0
+    while True:
+        moved = archive_batch(before, batch_size)
+        archived += moved
+        if moved < batch_size:
+            return archived
+
+
+def history_branches(user):
+    """
+    The user's games, live and archived, as one queryset per table and
+    seat. Each is a range scan of its (player, created_at, id) index.
+    """
+    games, archived = Game.objects.select_related('player1', 'player2', 'winner'), archived_games()
+    return [games.filter(player1=user), games.filter(player2=user),
+            archived.filter(player1=user), archived.filter(player2=user)]
+
+
+def archived_games():
+    return ArchivedGame.objects.select_related('player1', 'player2', 'winner')
+
+
+def merged(querysets, key=attrgetter('created_at', 'id'), chunk_size=2000):
+    """Stream querysets that are each ordered by key as one sequence in that order."""
+    return heapq.merge(*(queryset.iterator(chunk_size=chunk_size) for queryset in querysets), key=key)
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    In-process cache of user rows by id, least recently used first out.
+
+    Holds at most AUTH_USER_CACHE_SIZE users, each for AUTH_USER_CACHE_TTL
+    seconds. Only the column values are cached and every get() builds a
+    new User from them, so nothing set on one request's user (a cached
+    profile, an edited field) leaks into another request. Entries are
+    dropped when the user is saved or deleted in this process; changes made
+    by other workers, or by queryset.update(), are seen after the TTL.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (expires_at, values)
+        # Bumped by every invalidate() and clear(): a row read while it
+        # changed may predate the change, so it is returned but not cached
+        self._epoch = 0
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+    @property
+    def maxsize(self):
+        return self._maxsize if self._maxsize is not None else settings.AUTH_USER_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.AUTH_USER_CACHE_TTL
+
+    def get(self, user_id):
+        """The user with id user_id, or None if there is none."""
+        model = get_user_model()
+        field_names = [field.attname for field in model._meta.concrete_fields]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return model.from_db(DEFAULT_DB_ALIAS, field_names, entry[1])
+            epoch = self._epoch
+
+        values = model._default_manager.filter(pk=user_id).values_list(*field_names).first()
+        if values is None:
+            return None
+        with self._lock:
+            if self._epoch != epoch:
+                return model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+            self._entries[user_id] = (now + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through user_cache
+    instead of a query per request, with the same checks: the user must
+    exist and be active, and with CHECK_REVOKE_TOKEN its password must not
+    have changed since the token was issued.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_FIELD != self.user_model._meta.pk.attname:
+            # The cache is keyed by primary key
+            return super().get_user(validated_token)
+        try:
+            user_id = self.user_model._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
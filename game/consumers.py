@@ -0,0 +1,45 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.db.models import Q
+
+from .events import game_group_name
+from .models import Game
+
+
+class GameConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes move and completion events for one game to its players.
+
+    Clients connect to ws/games/<game_id>/?token=<access token>; the socket
+    is closed with code 4401 without a valid token and 4403 for users who
+    are not playing the game.
+    """
+
+    async def connect(self):
+        self.game_id = self.scope['url_route']['kwargs']['game_id']
+        self.group_name = game_group_name(self.game_id)
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        if not await self.is_participant(user):
+            await self.close(code=4403)
+            return
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Moves are made through the REST API; the socket is push-only
+        pass
+
+    async def game_event(self, message):
+        await self.send_json(message['event'])
+
+    @database_sync_to_async
+    def is_participant(self, user):
+        return Game.objects.filter(
+            Q(player1=user) | Q(player2=user), pk=self.game_id
+        ).exists()
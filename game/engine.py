@@ -0,0 +1,289 @@
+"""
+Bitboard tic-tac-toe engine.
+
+A position is stored as two masks, one for X and one for O. Bit
+``x * size + y`` is set when the player occupies row ``x``, column ``y`` of
+the board, so win, draw and legal-move checks are plain integer operations.
+The classic game is a 3x3 board with 3 in a row; ``Rules`` describes larger
+N x N boards with k in a row.
+"""
+from functools import lru_cache
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL_MASK = (1 << CELLS) - 1
+MIN_SIZE = 3
+MAX_SIZE = 19
+
+# The 8 winning lines of the 3x3 game: 3 rows, 3 columns and the 2 diagonals
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+# WINNING[mask] is True when a 3x3 mask contains at least one full line
+WINNING = tuple(
+    any(mask & line == line for line in WIN_MASKS)
+    for mask in range(1 << CELLS)
+)
+
+X = 'X'
+O = 'O'
+
+# One-character-per-cell board strings: str.translate tables that turn a
+# board into the binary digits of the X or O mask, and base-3 digits back
+# into cells
+EMPTY_CELL = '.'
+X_DIGITS = str.maketrans({X: '1', O: '0', EMPTY_CELL: '0'})
+O_DIGITS = str.maketrans({X: '0', O: '1', EMPTY_CELL: '0'})
+CELL_DIGITS = str.maketrans({'0': EMPTY_CELL, '1': X, '2': O})
+
+# Row lookups for converting 3x3 boards to and from the list-of-lists form:
+# ROW_CELLS maps a row's 3-bit X and O masks to its cells, ROW_MASKS the reverse
+ROW_CELLS = {}
+ROW_MASKS = {}
+for _x_row in range(1 << SIZE):
+    for _o_row in range(1 << SIZE):
+        if _x_row & _o_row:
+            continue
+        _cells = tuple(
+            X if _x_row >> i & 1 else O if _o_row >> i & 1 else None
+            for i in range(SIZE)
+        )
+        ROW_CELLS[_x_row, _o_row] = _cells
+        ROW_MASKS[_cells] = (_x_row, _o_row)
+del _x_row, _o_row, _cells
+
+# Row, column, diagonal and anti-diagonal steps walked from the last move
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def iter_bits(mask):
+    """Yield the index of every set bit in mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def side_to_move(x, o):
+    """X moves first, so X is to move whenever the counts are equal."""
+    return X if bin(x).count('1') == bin(o).count('1') else O
+
+
+class Rules:
+    """Geometry and win condition of a size x size, k-in-a-row board."""
+    __slots__ = ('size', 'win_length', 'cells', 'full_mask', 'win_masks')
+
+    def __init__(self, size=SIZE, win_length=SIZE):
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f'size must be between {MIN_SIZE} and {MAX_SIZE}')
+        if not MIN_SIZE <= win_length <= size:
+            raise ValueError(f'win_length must be between {MIN_SIZE} and size')
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.full_mask = (1 << self.cells) - 1
+        self.win_masks = WIN_MASKS if self.is_standard else tuple(self._line_masks())
+
+    def __repr__(self):
+        return f"Rules(size={self.size}, win_length={self.win_length})"
+
+    @property
+    def is_standard(self):
+        return self.size == SIZE and self.win_length == SIZE
+
+    def _line_masks(self):
+        size, k = self.size, self.win_length
+        for dx, dy in DIRECTIONS:
+            for x in range(size):
+                for y in range(size):
+                    if not self.in_bounds(x + dx * (k - 1), y + dy * (k - 1)):
+                        continue
+                    mask = 0
+                    for step in range(k):
+                        mask |= 1 << self.cell_index(x + dx * step, y + dy * step)
+                    yield mask
+
+    def cell_index(self, x, y):
+        return x * self.size + y
+
+    def cell_coords(self, index):
+        return divmod(index, self.size)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    def has_line(self, mask):
+        """Full scan for any winning line in mask."""
+        if self.is_standard:
+            return WINNING[mask]
+        return any(mask & line == line for line in self.win_masks)
+
+    def completes_line(self, mask, index):
+        """
+        Whether the stone on index is part of a winning line in mask.
+
+        Only the four lines through index are walked, and each walk stops
+        after win_length cells, so the cost is O(k) whatever the board size.
+        """
+        if self.is_standard:
+            return WINNING[mask]
+        size, k = self.size, self.win_length
+        x0, y0 = divmod(index, size)
+        for dx, dy in DIRECTIONS:
+            count = 1
+            x, y = x0 + dx, y0 + dy
+            while count < k and 0 <= x < size and 0 <= y < size and mask >> (x * size + y) & 1:
+                count += 1
+                x += dx
+                y += dy
+            x, y = x0 - dx, y0 - dy
+            while count < k and 0 <= x < size and 0 <= y < size and mask >> (x * size + y) & 1:
+                count += 1
+                x -= dx
+                y -= dy
+            if count >= k:
+                return True
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_rules(size=SIZE, win_length=SIZE):
+    return Rules(size, win_length)
+
+
+STANDARD = get_rules()
+
+
+def cell_index(x, y):
+    return STANDARD.cell_index(x, y)
+
+
+def cell_coords(index):
+    return STANDARD.cell_coords(index)
+
+
+def in_bounds(x, y):
+    return STANDARD.in_bounds(x, y)
+
+
+class Position:
+    """Immutable board position held as an X mask and an O mask."""
+    __slots__ = ('x', 'o', 'rules')
+
+    def __init__(self, x=0, o=0, rules=STANDARD):
+        self.x = x
+        self.o = o
+        self.rules = rules
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and self.rules is other.rules
+                and self.x == other.x and self.o == other.o)
+
+    def __hash__(self):
+        return hash((self.x, self.o, self.rules.size, self.rules.win_length))
+
+    def __repr__(self):
+        return f"Position(x={self.x:#x}, o={self.o:#x}, rules={self.rules!r})"
+
+    @classmethod
+    def from_board(cls, board, rules=STANDARD):
+        """Build a position from the list-of-lists board stored on Game."""
+        x = o = 0
+        if rules.size == SIZE:
+            shift = 0
+            for row in board:
+                x_row, o_row = ROW_MASKS[tuple(row)]
+                x |= x_row << shift
+                o |= o_row << shift
+                shift += SIZE
+            return cls(x, o, rules)
+        bit = 1
+        for row in board:
+            for cell in row:
+                if cell == X:
+                    x |= bit
+                elif cell == O:
+                    o |= bit
+                bit <<= 1
+        return cls(x, o, rules)
+
+    @classmethod
+    def from_string(cls, encoded, rules=STANDARD):
+        """Build a position from the one-character-per-cell form stored on Game."""
+        # Reversed so the first cell lands on bit 0
+        x = int(encoded.translate(X_DIGITS)[::-1] or '0', 2)
+        o = int(encoded.translate(O_DIGITS)[::-1] or '0', 2)
+        return cls(x, o, rules)
+
+    def to_string(self):
+        """'X', 'O' or EMPTY_CELL for every cell, row by row."""
+        # Read as decimal, the binary digits of x plus twice those of o never
+        # carry, leaving one 0/1/2 digit per cell (last cell first)
+        digits = int(bin(self.x)[2:]) + 2 * int(bin(self.o)[2:])
+        return format(digits, f'0{self.rules.cells}d')[::-1].translate(CELL_DIGITS)
+
+    def to_board(self):
+        """Return the list-of-lists representation used by the API."""
+        x, o, size = self.x, self.o, self.rules.size
+        if size == SIZE:
+            return [
+                list(ROW_CELLS[x >> shift & 0b111, o >> shift & 0b111])
+                for shift in range(0, CELLS, SIZE)
+            ]
+        return [
+            [X if x >> i & 1 else O if o >> i & 1 else None
+             for i in range(row * size, row * size + size)]
+            for row in range(size)
+        ]
+
+    @property
+    def occupied(self):
+        return self.x | self.o
+
+    def mask_for(self, symbol):
+        return self.x if symbol == X else self.o
+
+    def to_move(self):
+        return side_to_move(self.x, self.o)
+
+    def is_empty(self, index):
+        return not self.occupied >> index & 1
+
+    def play(self, index, symbol):
+        """Return the position after symbol is placed on cell index."""
+        bit = 1 << index
+        if symbol == X:
+            return Position(self.x | bit, self.o, self.rules)
+        return Position(self.x, self.o | bit, self.rules)
+
+    def legal_moves_mask(self):
+        return ~self.occupied & self.rules.full_mask
+
+    def legal_moves(self):
+        return list(iter_bits(self.legal_moves_mask()))
+
+    def is_winning_move(self, index, symbol):
+        """Whether symbol's stone on index completes a line; O(k) per call."""
+        return self.rules.completes_line(self.mask_for(symbol), index)
+
+    def has_won(self, symbol):
+        return self.rules.has_line(self.mask_for(symbol))
+
+    def winner(self):
+        if self.rules.has_line(self.x):
+            return X
+        if self.rules.has_line(self.o):
+            return O
+        return None
+
+    def is_full(self):
+        return self.occupied == self.rules.full_mask
+
+    def is_draw(self):
+        return self.is_full() and self.winner() is None
+
+    def is_over(self):
+        return self.is_full() or self.winner() is not None
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .serializers import GameStateSerializer
+
+
+class _Listener:
+    """One waiting request: an asyncio.Event on its event loop, set from any thread."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        """
+        Wait until the game changes or timeout seconds pass. Returns True
+        when woken by a change, including one that happened since the last
+        wait, so a move made between a DB check and the wait is never missed.
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        # No await since the wake-up, so a later set() cannot be cleared here
+        self.event.clear()
+        return True
+
+
+class MoveNotifier:
+    """
+    In-process wake-ups for requests waiting on a game to change.
+
+    Waiters are coroutines, so a waiting request holds no thread; notify()
+    may be called from any thread. Entries only exist while someone is
+    listening, so idle games cost nothing. Moves handled by other processes
+    are not seen here; waiters must still re-check the database at a
+    bounded interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @contextmanager
+    def listen(self, game_id):
+        """Register a listener for game_id; use it from a coroutine on its running loop."""
+        listener = _Listener(asyncio.get_running_loop())
+        with self._lock:
+            self._entries.setdefault(game_id, set()).add(listener)
+        try:
+            yield listener
+        finally:
+            with self._lock:
+                listeners = self._entries[game_id]
+                listeners.discard(listener)
+                if not listeners:
+                    del self._entries[game_id]
+
+    def notify(self, game_id):
+        with self._lock:
+            listeners = list(self._entries.get(game_id, ()))
+        for listener in listeners:
+            listener.wake()
+
+
+move_notifier = MoveNotifier()
+
+
+def game_group_name(game_id):
+    return f'game_{game_id}'
+
+
+def build_game_event(game, move=None):
+    """Payload pushed to clients after a move; carries the same state make_move returns."""
+    event = {
+        'type': 'game.completed' if game.status == 'completed' else 'game.move',
+        'game': GameStateSerializer(game).data,
+    }
+    if move is not None:
+        event['move'] = {
+            'player': move.player_id,
+            'position_x': move.position_x,
+            'position_y': move.position_y,
+        }
+    return event
+
+
+def publish_game_event(game, move=None):
+    """
+    Wake long-poll waiters and push a game update to every WebSocket
+    subscribed to the game.
+
+    Call this only after the move has been committed (via
+    transaction.on_commit) so clients never see state that is rolled back.
+    """
+    move_notifier.notify(game.pk)
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        game_group_name(game.pk),
+        {'type': 'game.event', 'event': build_game_event(game, move)},
+    )
@@ -0,0 +1,9 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class GameConflict(APIException):
+    """Another request changed the game between our read and our write."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = {'error': 'Game was changed by another request, reload it and retry'}
+    default_code = 'conflict'
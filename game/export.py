@@ -0,0 +1,112 @@
+"""
+NDJSON export of games with their moves, one game per line.
+
+Games are streamed with iterator(), so only one chunk of games and that
+chunk's moves (prefetched, or read from the move log) are in memory at a time, whatever the size of the table. Under
+ASGI the endpoint streams aiter_ndjson instead: Django would collect a
+sync iterator into a list before sending anything. Live
+and archived games are merged into one sequence in creation order. The
+same lines are produced by the games/export/ endpoint and the export_games
+command, and read back by import_games.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .archive import merged
+from .models import ArchivedGame, Game, Move
+from .movelog import uses_move_log
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def parse_bound(value):
+    """A datetime from an ISO date or datetime string; dates mean midnight UTC."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def export_querysets(since=None, until=None, username=None):
+    """
+    Querysets of the live and the archived games created in [since, until),
+    optionally only those username played, each oldest first. since and
+    until are ISO strings; raises ValueError if either cannot be parsed.
+    """
+    since, until = parse_bound(since), parse_bound(until)
+    querysets = []
+    for model in (Game, ArchivedGame):
+        games = model.objects.select_related('player1', 'player2', 'winner')
+        if since is not None:
+            games = games.filter(created_at__gte=since)
+        if until is not None:
+            games = games.filter(created_at__lt=until)
+        if username:
+            games = games.filter(Q(player1__username=username) | Q(player2__username=username))
+        querysets.append(games.order_by('created_at', 'id'))
+    if not uses_move_log():
+        # Archived games only have the move log
+        querysets[0] = querysets[0].prefetch_related(
+            Prefetch('moves', queryset=Move.objects.order_by('created_at', 'id')
+                     .only('game_id', 'player_id', 'position_x', 'position_y', 'created_at'))
+        )
+    return querysets
+
+
+def game_record(game):
+    """The exported form of a game; moves name their player by username."""
+    usernames = {game.player1_id: game.player1.username, game.player2_id: game.player2.username}
+    return {
+        'id': game.id,
+        'player1': game.player1.username,
+        'player2': game.player2.username,
+        'size': game.size,
+        'win_length': game.win_length,
+        'status': game.status,
+        'winner': game.winner.username if game.winner_id else None,
+        'created_at': game.created_at,
+        'updated_at': game.updated_at,
+        'moves': [
+            {'player': usernames[move.player_id], 'x': move.position_x, 'y': move.position_y,
+             'created_at': move.created_at}
+            for move in game.move_history()
+        ],
+    }
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """Keeps microseconds, which DjangoJSONEncoder rounds to milliseconds, so imports round-trip exactly."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def iter_ndjson(querysets, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one JSON line per game of querysets, in creation order; moves are prefetched chunk_size games at a time."""
+    encoder = ExportEncoder(separators=(',', ':'))
+    for game in merged(querysets, chunk_size=chunk_size):
+        yield encoder.encode(game_record(game)) + '\n'
+
+
+async def aiter_ndjson(querysets, chunk_size=EXPORT_CHUNK_SIZE):
+    """iter_ndjson for ASGI: each chunk of lines is read in the thread that serves the request's sync code."""
+    lines = iter_ndjson(querysets, chunk_size)
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_size)), thread_sensitive=True)
+    while chunk := await next_chunk():
+        yield chunk
@@ -0,0 +1,135 @@
+from functools import lru_cache
+from math import isqrt
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+from .engine import EMPTY_CELL, MAX_SIZE, MIN_SIZE, O, X, Position
+
+DECODED_CELLS = {EMPTY_CELL: None, X: X, O: O}
+
+
+@lru_cache(maxsize=4096)
+def _decode_row(row):
+    return tuple(DECODED_CELLS[cell] for cell in row)
+
+
+class Board:
+    """
+    A board as stored: one 'X', 'O' or '.' per cell, row by row. The
+    list-of-lists form the API returns is only built when asked for, and
+    comparisons, hashing and SQL lookups use the string itself.
+    """
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded=''):
+        self.encoded = encoded
+
+    @classmethod
+    def from_lists(cls, rows):
+        return cls(''.join(EMPTY_CELL if cell is None else cell for row in rows for cell in row))
+
+    @classmethod
+    def parse(cls, encoded):
+        """A Board from user input; raises ValueError unless it is a square board of X, O and '.'."""
+        size = isqrt(len(encoded))
+        if size * size != len(encoded) or not MIN_SIZE <= size <= MAX_SIZE \
+                or encoded.strip(EMPTY_CELL + X + O):
+            raise ValueError(f"board must be {MIN_SIZE}-{MAX_SIZE} rows of 'X', 'O' and '.'")
+        return cls(encoded)
+
+    @property
+    def size(self):
+        return isqrt(len(self.encoded))
+
+    def to_lists(self):
+        size, encoded = self.size, self.encoded
+        # Rows repeat a lot across boards, so each distinct one is decoded once
+        return [list(_decode_row(encoded[start:start + size])) for start in range(0, len(encoded), size)]
+
+    def position(self, rules):
+        return Position.from_string(self.encoded, rules)
+
+    def symmetries(self):
+        """The distinct encodings of this board under its 4 rotations and 2 reflections."""
+        size = self.size
+        rows = [self.encoded[start:start + size] for start in range(0, len(self.encoded), size)]
+        forms = set()
+        for _ in range(4):
+            forms.add(''.join(rows))
+            forms.add(''.join(row[::-1] for row in rows))
+            rows = [''.join(column) for column in zip(*reversed(rows))]
+        return sorted(forms)
+
+    def __iter__(self):
+        return iter(self.to_lists())
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return bool(self.encoded)
+
+    def __eq__(self, other):
+        if isinstance(other, Board):
+            return self.encoded == other.encoded
+        if isinstance(other, str):
+            return self.encoded == other
+        if isinstance(other, list):
+            return self.to_lists() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.encoded)
+
+    def __str__(self):
+        return self.encoded
+
+    def __repr__(self):
+        return f'Board({self.encoded!r})'
+
+
+def encode_board(value):
+    """The stored string for a Board, a list-of-lists board or an encoded string."""
+    if isinstance(value, Board):
+        return value.encoded
+    if isinstance(value, (list, tuple)):
+        return Board.from_lists(value).encoded
+    return value
+
+
+class BoardDescriptor(DeferredAttribute):
+    """Turns whatever is assigned to the field into a Board."""
+
+    def __set__(self, instance, value):
+        if value is not None and not isinstance(value, Board):
+            value = Board(encode_board(value))
+        instance.__dict__[self.field.attname] = value
+
+
+class BoardField(models.CharField):
+    """
+    Stores a board as a fixed-width string, so it can be indexed and
+    compared in SQL, and loads it as a Board. Accepts Board instances,
+    list-of-lists boards and encoded strings.
+    """
+    description = 'Board encoded as one character per cell'
+    descriptor_class = BoardDescriptor
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', MAX_SIZE * MAX_SIZE)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else Board(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Board):
+            return value
+        return Board(encode_board(value))
+
+    def get_prep_value(self, value):
+        return None if value is None else encode_board(value)
+
+    def value_to_string(self, obj):
+        return encode_board(self.value_from_object(obj))
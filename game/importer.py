@@ -0,0 +1,259 @@
+"""
+Bulk import of games in the NDJSON format written by game.export.
+
+Every record is replayed on bitboards before anything is written, so an
+illegal or inconsistent game is rejected without touching the database.
+Valid games are inserted with bulk_create in batches, packed move log
+included, and their recorded timestamps restored with a CASE UPDATE per
+chunk; their Move rows, unless GAME_MOVE_STORAGE is 'log', go in with one
+raw executemany INSERT that carries the move times. Player statistics are
+added up in memory and written once at the end. Ratings are not: run recompute_ratings after an import.
+"""
+from collections import defaultdict, namedtuple
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .engine import Position, get_rules
+from .models import Game, Move, UserProfile
+from .movelog import pack_cells, pack_times, uses_move_log
+
+
+# Players per statistics UPDATE; each adds four CASE branches
+STATS_CHUNK_SIZE = 500
+
+
+class InvalidGame(ValueError):
+    pass
+
+
+def replay(record):
+    """
+    Check a record's moves against the rules. Returns (rules, cells,
+    x_mask, o_mask, winner_seat) where cells are the move indexes in order
+    and winner_seat is 1, 2 or None; raises InvalidGame.
+    """
+    try:
+        size = int(record.get('size', 3))
+        rules = get_rules(size, int(record.get('win_length', min(size, 5))))
+    except (TypeError, ValueError) as error:
+        raise InvalidGame(str(error))
+
+    player1, player2 = record.get('player1'), record.get('player2')
+    if not player1 or not player2 or player1 == player2:
+        raise InvalidGame('player1 and player2 must be two different usernames')
+
+    masks = [0, 0]
+    cells = []
+    winner_seat = None
+    for turn, move in enumerate(record.get('moves') or ()):
+        if winner_seat is not None or len(cells) == rules.cells:
+            raise InvalidGame(f'move {turn + 1} is played after the game ended')
+        seat = turn % 2
+        if move.get('player', (player1, player2)[seat]) != (player1, player2)[seat]:
+            raise InvalidGame(f'move {turn + 1} is not played by {(player1, player2)[seat]}')
+        x, y = move.get('x'), move.get('y')
+        if not isinstance(x, int) or not isinstance(y, int) or not rules.in_bounds(x, y):
+            raise InvalidGame(f'move {turn + 1} is off the board')
+        index = rules.cell_index(x, y)
+        bit = 1 << index
+        if (masks[0] | masks[1]) & bit:
+            raise InvalidGame(f'move {turn + 1} is on an occupied cell')
+        masks[seat] |= bit
+        cells.append(index)
+        if rules.completes_line(masks[seat], index):
+            winner_seat = seat + 1
+
+    finished = winner_seat is not None or len(cells) == rules.cells
+    if 'status' in record and record['status'] != ('completed' if finished else 'ongoing'):
+        raise InvalidGame(f"status {record['status']!r} does not match the moves")
+    if 'winner' in record and record['winner'] != (None if winner_seat is None else (player1, player2)[winner_seat - 1]):
+        raise InvalidGame(f"winner {record['winner']!r} does not match the moves")
+    return rules, cells, masks[0], masks[1], winner_seat
+
+
+def insert_rows(model, fields, rows):
+    """
+    INSERT rows of field values with one prepared executemany. Unlike
+    bulk_create, nothing is stamped by pre_save, so auto_now_add fields keep
+    the value given, and no primary keys are read back.
+    """
+    db = connections[DEFAULT_DB_ALIAS]  # Resolved once, not per value through the proxy
+    quote = db.ops.quote_name
+    columns = [model._meta.get_field(name) for name in fields]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table), ', '.join(quote(field.column) for field in columns),
+        ', '.join(['%s'] * len(columns)))
+    with db.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, db) for field, value in zip(columns, values)]
+            for values in rows
+        ])
+
+
+def update_rows(model, fields, rows):
+    """
+    Set fields from rows of (pk, *values) with one CASE UPDATE per chunk of
+    rows that fits the query parameter limit. Like insert_rows, it bypasses
+    pre_save, and it skips building bulk_update's When expression per row.
+    """
+    db = connections[DEFAULT_DB_ALIAS]
+    quote = db.ops.quote_name
+    columns = [model._meta.get_field(name) for name in fields]
+    pk = quote(model._meta.pk.column)
+    rows = list(rows)
+    chunk_size = (db.features.max_query_params or len(rows) or 1) // (2 * len(columns) + 1)
+    with db.cursor() as cursor:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            cases, params = [], []
+            for position, field in enumerate(columns, 1):
+                cases.append('{} = CASE {} {} END'.format(
+                    quote(field.column), pk, ' '.join(['WHEN %s THEN %s'] * len(chunk))))
+                for row in chunk:
+                    params += [row[0], field.get_db_prep_save(row[position], db)]
+            cursor.execute('UPDATE {} SET {} WHERE {} IN ({})'.format(
+                quote(model._meta.db_table), ', '.join(cases), pk, ', '.join(['%s'] * len(chunk))),
+                params + [row[0] for row in chunk])
+
+
+def parse_timestamp(value, default):
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise InvalidGame(f'invalid timestamp {value!r}')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+ReplayedGame = namedtuple('ReplayedGame', (
+    'line', 'player1', 'player2', 'rules', 'cells', 'x_mask', 'o_mask', 'winner_seat',
+    'created_at', 'updated_at', 'move_times',
+))
+
+
+class GameImporter:
+    """
+    Collects replayed games and writes them batch_size at a time. Call
+    add() per record, then finish() to flush the last batch and write the
+    aggregated profile statistics. Records naming unknown users are skipped
+    (or their users created with create_users) and reported in errors.
+    """
+
+    def __init__(self, batch_size=1000, create_users=False, dry_run=False):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.dry_run = dry_run
+        self.user_ids = {}
+        self.pending = []
+        # user_id -> [played, won, lost, drawn]
+        self.stats = defaultdict(lambda: [0, 0, 0, 0])
+        self.imported = 0
+        self.errors = []
+
+    def add(self, record, line=None):
+        """Validate one record and queue it; raises InvalidGame."""
+        rules, cells, x_mask, o_mask, winner_seat = replay(record)
+        created_at = parse_timestamp(record.get('created_at'), timezone.now())
+        updated_at = parse_timestamp(record.get('updated_at'), created_at)
+        move_times = [parse_timestamp(move.get('created_at'), created_at) for move in record.get('moves') or ()]
+        self.pending.append(ReplayedGame(line, record['player1'], record['player2'], rules, cells, x_mask,
+                                         o_mask, winner_seat, created_at, updated_at, move_times))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def resolve_users(self, usernames):
+        """Fill user_ids for usernames, creating missing users if allowed."""
+        missing = [name for name in usernames if name not in self.user_ids]
+        if missing:
+            self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+            missing = [name for name in missing if name not in self.user_ids]
+        if missing and self.create_users and not self.dry_run:
+            # bulk_create skips the post_save signal, so profiles are created in finish()
+            password = make_password(None)
+            User.objects.bulk_create(User(username=name, password=password) for name in missing)
+            self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        with transaction.atomic():
+            self.resolve_users({name for game in batch for name in (game.player1, game.player2)})
+            games = []
+            for replayed in batch:
+                missing = [name for name in (replayed.player1, replayed.player2) if name not in self.user_ids]
+                if missing and not (self.dry_run and self.create_users):
+                    self.errors.append((replayed.line, f'unknown users: {", ".join(missing)}'))
+                elif not self.dry_run:
+                    games.append((self.build_game(replayed), replayed))
+                else:
+                    self.imported += 1
+            if self.dry_run:
+                return
+            self.imported += len(games)
+            Game.objects.bulk_create(game for game, _ in games)
+            # bulk_create stamps auto_now(_add) fields with now(); the recorded
+            # times are written back set-based, a few hundred games a statement
+            update_rows(Game, ['created_at', 'updated_at'], (
+                (game.pk, replayed.created_at, replayed.updated_at) for game, replayed in games))
+            if not uses_move_log():
+                insert_rows(Move, ['game', 'player', 'position_x', 'position_y', 'created_at'], (
+                    (game.id, game.player2_id if turn % 2 else game.player1_id,
+                     index // replayed.rules.size, index % replayed.rules.size, replayed.move_times[turn])
+                    for game, replayed in games for turn, index in enumerate(replayed.cells)))
+            for game, replayed in games:
+                if game.status == 'completed':
+                    self.count_result(game.player1_id, game.player2_id, replayed.winner_seat)
+
+    def build_game(self, replayed):
+        player1_id, player2_id = self.user_ids[replayed.player1], self.user_ids[replayed.player2]
+        size, cells = replayed.rules.size, replayed.cells
+        finished = replayed.winner_seat is not None or len(cells) == replayed.rules.cells
+        return Game(
+            player1_id=player1_id, player2_id=player2_id,
+            current_turn_id=player2_id if len(cells) % 2 else player1_id,
+            board=Position(replayed.x_mask, replayed.o_mask, replayed.rules).to_string(),
+            size=size, win_length=replayed.rules.win_length,
+            status='completed' if finished else 'ongoing',
+            winner_id=(None, player1_id, player2_id)[replayed.winner_seat or 0],
+            version=len(cells),
+            move_log=pack_cells(cells, replayed.rules.cells), move_times=pack_times(replayed.move_times),
+        )
+
+    def count_result(self, player1_id, player2_id, winner_seat):
+        for seat, user_id in ((1, player1_id), (2, player2_id)):
+            counters = self.stats[user_id]
+            counters[0] += 1
+            if winner_seat is None:
+                counters[3] += 1
+            elif winner_seat == seat:
+                counters[1] += 1
+            else:
+                counters[2] += 1
+
+    def finish(self):
+        """Write the last batch, then every touched profile's counters in bulk."""
+        self.flush()
+        if self.dry_run or not self.stats:
+            return
+        user_ids = list(self.stats)
+        counters = ('games_played', 'games_won', 'games_lost', 'games_drawn')
+        with transaction.atomic():
+            UserProfile.objects.bulk_create(
+                (UserProfile(user_id=user_id) for user_id in user_ids), ignore_conflicts=True)
+            # One relative UPDATE per chunk of players, so games finished
+            # while the import ran are not overwritten
+            for start in range(0, len(user_ids), STATS_CHUNK_SIZE):
+                chunk = user_ids[start:start + STATS_CHUNK_SIZE]
+                UserProfile.objects.filter(user_id__in=chunk).update(**{
+                    name: F(name) + Case(
+                        *(When(user_id=user_id, then=Value(self.stats[user_id][position])) for user_id in chunk),
+                        default=Value(0),
+                    )
+                    for position, name in enumerate(counters)
+                })
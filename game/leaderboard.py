@@ -0,0 +1,131 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+
+from .ai import bot_user_id
+from .models import UserProfile
+
+# Keys pack (score descending, user_id ascending) into one integer so the
+# whole ranking is a flat sorted array('q'): 8 bytes per profile, plus a
+# user_id -> score dict to find a player's key
+SCORE_OFFSET = 1 << 30  # scores must stay within +-2**30
+USER_ID_BITS = 32
+
+
+def make_key(score, user_id):
+    return (SCORE_OFFSET - score) << USER_ID_BITS | user_id
+
+
+def split_key(key):
+    return SCORE_OFFSET - (key >> USER_ID_BITS), key & ((1 << USER_ID_BITS) - 1)
+
+
+class Leaderboard:
+    """
+    In-process ranking of every profile by UserProfile.RANKING_FIELD.
+
+    Loaded once in a single scan of the ranking index, then patched in place
+    when make_move completes a game or a profile is saved or deleted, so top-N is a slice and "my rank" is a
+    binary search. Ranks are competition style: tied players share the
+    better rank. The computer player is left out. Changes made by other
+    worker processes are picked up when the copy is older than
+    LEADERBOARD_CACHE_TTL seconds.
+    """
+
+    def __init__(self, ttl=None):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._scores = None
+        self._bot_id = None
+        self._loaded_at = 0
+        self._ttl = ttl
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.LEADERBOARD_CACHE_TTL
+
+    def _ensure_loaded(self):
+        if self._keys is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._keys
+        rows = UserProfile.objects.order_by(*UserProfile.RANKING_ORDER).values_list(
+            UserProfile.RANKING_FIELD, 'user_id')
+        bot_id = bot_user_id()
+        if bot_id is not None:
+            rows = rows.exclude(user_id=bot_id)
+        keys, scores = array('q'), {}
+        for score, user_id in rows.iterator(chunk_size=10000):
+            keys.append(make_key(score, user_id))
+            scores[user_id] = score
+        self._keys, self._scores, self._bot_id = keys, scores, bot_id
+        self._loaded_at = time.monotonic()
+        return keys
+
+    def invalidate(self):
+        """Drop the cached ranking; the next read reloads it from the database."""
+        with self._lock:
+            self._keys = self._scores = None
+
+    def update(self, user_id, score):
+        """
+        Move a player to score, adding them if they are new; score None
+        removes them. The old key is found from the cached score, which may
+        differ from the database when another worker changed it since.
+        """
+        with self._lock:
+            if self._keys is None or user_id == self._bot_id:
+                return
+            cached = self._scores.pop(user_id, None)
+            if cached is not None:
+                del self._keys[bisect_left(self._keys, make_key(cached, user_id))]
+            if score is not None:
+                insort(self._keys, make_key(score, user_id))
+                self._scores[user_id] = score
+
+    def record_changes(self, changes):
+        """Apply {user_id: (old_score, new_score)} from UserProfile.record_game_result."""
+        for user_id, (old_score, new_score) in changes.items():
+            self.update(user_id, new_score)
+
+    def rank_of_score(self, score):
+        """1-based rank a player with score holds: one more than the number of better scores."""
+        with self._lock:
+            keys = self._ensure_loaded()
+            return bisect_left(keys, make_key(score, 0)) + 1
+
+    def top(self, limit):
+        """[(rank, user_id, score)] for the best limit players."""
+        with self._lock:
+            keys = self._ensure_loaded()
+            head = keys[:limit]
+        entries = []
+        previous_score = rank = None
+        for position, key in enumerate(head, start=1):
+            score, user_id = split_key(key)
+            if score != previous_score:
+                rank, previous_score = position, score
+            entries.append((rank, user_id, score))
+        return entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ensure_loaded())
+
+
+leaderboard = Leaderboard()
+
+
+def profile_saved(sender, instance, created, update_fields=None, **kwargs):
+    """post_save receiver: add new players and follow direct rating edits, once committed."""
+    if not created and update_fields is not None and UserProfile.RANKING_FIELD not in update_fields:
+        return
+    score = getattr(instance, UserProfile.RANKING_FIELD)
+    transaction.on_commit(lambda: leaderboard.update(instance.user_id, score))
+
+
+def profile_deleted(sender, instance, **kwargs):
+    """post_delete receiver: drop the player once the deletion is committed."""
+    transaction.on_commit(lambda: leaderboard.update(instance.user_id, None))
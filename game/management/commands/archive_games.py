@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.archive import ARCHIVE_BATCH_SIZE, archive_cutoff, archive_games
+from game.models import Game
+
+
+class Command(BaseCommand):
+    help = (
+        'Move completed games last updated more than --days days ago, with '
+        'their moves, from the game tables into the archive table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=None,
+                            help='Archive games finished more than this many days ago '
+                                 '(default: GAME_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help='Games moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the games that would be archived')
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options['days'])
+        if options['dry_run']:
+            count = Game.objects.filter(status='completed', updated_at__lt=before).count()
+            self.stdout.write(f'{count} games finished before {before:%Y-%m-%d %H:%M} would be archived')
+            return
+
+        start = time.monotonic()
+        archived = archive_games(before, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} games finished before {before:%Y-%m-%d %H:%M} in {time.monotonic() - start:.1f}s'
+        ))
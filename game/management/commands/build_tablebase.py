@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from game.tablebase import write_tablebase
+
+
+class Command(BaseCommand):
+    help = (
+        'Solve 3x3 tic-tac-toe and write the tablebase file that workers '
+        'memory-map. Run before starting workers so none of them has to build it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None,
+                            help='Where to write the table (default: TABLEBASE_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.TABLEBASE_PATH
+        start = time.monotonic()
+        write_tablebase(path)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {path} in {time.monotonic() - start:.2f}s'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game.export import EXPORT_CHUNK_SIZE, export_querysets, iter_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Write every game with its moves as NDJSON, one game per line, streaming from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only games created at or after this ISO date or datetime')
+        parser.add_argument('--until', help='Only games created before this ISO date or datetime')
+        parser.add_argument('--user', help='Only games this username played')
+        parser.add_argument('--output', '-o', help='File to write (default: standard output)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Games fetched, with their moves, per round trip')
+
+    def handle(self, *args, **options):
+        try:
+            games = export_querysets(options['since'], options['until'], options['user'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        lines = iter_ndjson(games, options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        exported = 0
+        with open(options['output'], 'w') as output:
+            for line in lines:
+                output.write(line)
+                exported += 1
+        self.stderr.write(f'Exported {exported} games to {options["output"]}')
@@ -0,0 +1,59 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.importer import GameImporter, InvalidGame
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Import games from NDJSON (the export_games format), validating every '
+        'move sequence before inserting in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file to read, or '-' for standard input")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Games inserted per bulk_create batch')
+        parser.add_argument('--create-users', action='store_true',
+                            help='Create players that do not exist yet, without a usable password')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the file without writing anything')
+
+    def handle(self, *args, **options):
+        importer = GameImporter(options['batch_size'], options['create_users'], options['dry_run'])
+        start = time.monotonic()
+        try:
+            source = sys.stdin if options['path'] == '-' else open(options['path'])
+        except OSError as error:
+            raise CommandError(error)
+
+        with source:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    importer.add(json.loads(line), line_number)
+                except (InvalidGame, json.JSONDecodeError) as error:
+                    importer.errors.append((line_number, str(error)))
+                except (AttributeError, KeyError, TypeError, ValueError) as error:
+                    importer.errors.append((line_number, f'malformed record ({error!r})'))
+        importer.finish()
+
+        importer.errors.sort()
+        for line_number, message in importer.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'line {line_number}: {message}')
+        if len(importer.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f'... and {len(importer.errors) - MAX_REPORTED_ERRORS} more')
+
+        action = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {importer.imported} games, skipped {len(importer.errors)} '
+            f'in {time.monotonic() - start:.1f}s'
+        ))
+        if importer.stats:
+            self.stdout.write('Ratings do not include the imported games; run recompute_ratings to update them.')
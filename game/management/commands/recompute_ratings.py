@@ -0,0 +1,74 @@
+import time
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from game.ai import bot_user_id
+from game.archive import merged
+from game.leaderboard import leaderboard
+from game.models import ArchivedGame, Game, UserProfile
+from game.rating import INITIAL_RATING, rating_delta, winner_side
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every Elo rating from scratch by replaying completed games, '
+        'live and archived, in the order they were created. Games against the '
+        'computer player are not rated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows fetched per round trip while streaming games and profiles')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Profiles written per bulk_update statement')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        batch_size = options['batch_size']
+        start = time.monotonic()
+
+        # Memory is bounded by the number of players, not games: games are
+        # streamed as bare tuples and only the running ratings are kept
+        ratings = {}
+        fields = ('created_at', 'id', 'player1_id', 'player2_id', 'winner_id')
+        games = merged([
+            Game.objects.filter(status='completed').order_by('created_at', 'id').values_list(*fields),
+            ArchivedGame.objects.order_by('created_at', 'id').values_list(*fields),
+        ], key=itemgetter(0, 1), chunk_size=chunk_size)
+        replayed = 0
+        bot_id = bot_user_id()
+        for _, _, player1_id, player2_id, winner_id in games:
+            if bot_id in (player1_id, player2_id):
+                continue
+            player1_rating = ratings.get(player1_id, INITIAL_RATING)
+            player2_rating = ratings.get(player2_id, INITIAL_RATING)
+            delta = rating_delta(player1_rating, player2_rating, winner_side(player1_id, winner_id))
+            ratings[player1_id] = player1_rating + delta
+            ratings[player2_id] = player2_rating - delta
+            replayed += 1
+
+        updated = 0
+        batch = []
+        with transaction.atomic():
+            profiles = UserProfile.objects.only('id', 'user_id', 'rating').order_by('id')
+            for profile in profiles.iterator(chunk_size=chunk_size):
+                rating = ratings.get(profile.user_id, INITIAL_RATING)
+                if profile.rating == rating:
+                    continue
+                profile.rating = rating
+                batch.append(profile)
+                if len(batch) >= batch_size:
+                    UserProfile.objects.bulk_update(batch, ['rating'])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                UserProfile.objects.bulk_update(batch, ['rating'])
+                updated += len(batch)
+            # bulk_update sends no signals; other workers catch up after LEADERBOARD_CACHE_TTL
+            transaction.on_commit(leaderboard.invalidate)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {replayed} games, updated {updated} ratings in {time.monotonic() - start:.1f}s'
+        ))
@@ -0,0 +1,158 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Game, MatchmakingEntry, UserProfile
+from .rating import INITIAL_RATING
+
+
+class MatchmakingQueue:
+    """
+    In-process index of waiting players sorted by rating.
+
+    Finding the closest opponent is a binary search followed by a walk
+    outwards; MatchmakingEntry rows stay the source of truth. A pairing only
+    counts once the opponent's row is claimed with a conditional UPDATE, so
+    two requests (or two workers) can never take the same opponent. The
+    index is rebuilt from the waiting rows on first use, and every
+    MATCHMAKING_RELOAD_INTERVAL seconds to see players queued by other
+    workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []  # (rating, user_id), ascending; only waiting players, so few
+        self._ratings = {}
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < settings.MATCHMAKING_RELOAD_INTERVAL:
+            return
+        waiting = MatchmakingEntry.objects.filter(game__isnull=True).values_list('user_id', 'rating')
+        self._ratings = dict(waiting)
+        self._keys = sorted((rating, user_id) for user_id, rating in self._ratings.items())
+        self._loaded_at = now
+
+    def reset(self):
+        with self._lock:
+            self._keys = []
+            self._ratings = {}
+            self._loaded_at = None
+
+    def add(self, user_id, rating):
+        with self._lock:
+            self._ensure_loaded()
+            if user_id in self._ratings:
+                return
+            self._ratings[user_id] = rating
+            insort(self._keys, (rating, user_id))
+
+    def remove(self, user_id):
+        with self._lock:
+            rating = self._ratings.pop(user_id, None)
+            if rating is None:
+                return
+            index = bisect_left(self._keys, (rating, user_id))
+            if index < len(self._keys) and self._keys[index] == (rating, user_id):
+                del self._keys[index]
+
+    def closest(self, rating, max_gap, exclude):
+        """Waiting user ids within max_gap of rating, closest first."""
+        with self._lock:
+            self._ensure_loaded()
+            keys = self._keys
+            below = bisect_left(keys, (rating, 0)) - 1
+            above = below + 1
+            found = []
+            while below >= 0 or above < len(keys):
+                below_gap = rating - keys[below][0] if below >= 0 else None
+                above_gap = keys[above][0] - rating if above < len(keys) else None
+                if above_gap is None or (below_gap is not None and below_gap <= above_gap):
+                    gap, key = below_gap, keys[below]
+                    below -= 1
+                else:
+                    gap, key = above_gap, keys[above]
+                    above += 1
+                if gap > max_gap:
+                    break
+                user_id = key[1]
+                if user_id != exclude:
+                    found.append(user_id)
+                    if len(found) >= settings.MATCHMAKING_CANDIDATES:
+                        break
+            return found
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._keys)
+
+
+queue = MatchmakingQueue()
+
+
+def allowed_gap(entry):
+    """Rating gap accepted for entry, widening the longer it has waited."""
+    waited = (timezone.now() - entry.created_at).total_seconds()
+    return settings.MATCHMAKING_RATING_GAP + int(waited * settings.MATCHMAKING_GAP_PER_SECOND)
+
+
+def try_match(entry):
+    """
+    Pair a waiting entry with the closest claimable opponent. Returns the
+    new Game, with the opponent (who waited longer) moving first, or None.
+    """
+    for opponent_id in queue.closest(entry.rating, allowed_gap(entry), exclude=entry.user_id):
+        game = claimed = None
+        with transaction.atomic():
+            # Leave the queue first: if someone paired with us meanwhile, that game wins
+            if MatchmakingEntry.objects.filter(pk=entry.pk, game__isnull=True).delete()[0]:
+                game = Game.objects.create(player1_id=opponent_id, player2_id=entry.user_id,
+                                           current_turn_id=opponent_id)
+                claimed = MatchmakingEntry.objects.filter(user_id=opponent_id, game__isnull=True).update(game=game)
+            if not claimed:
+                transaction.set_rollback(True)
+        if game is None:
+            # Checked after the rolled back block, so check() really consumes the entry
+            paired = MatchmakingEntry.objects.filter(pk=entry.pk, game__isnull=False).first()
+            return check(paired) if paired else None
+        queue.remove(opponent_id)
+        if claimed:
+            queue.remove(entry.user_id)
+            return game
+    return None
+
+
+def join(user):
+    """
+    Put user in the queue, or pair them straight away. Returns (entry, game);
+    game is set when a match was made, either now or while they waited.
+    """
+    rating = UserProfile.objects.filter(user=user).values_list('rating', flat=True).first()
+    entry, created = MatchmakingEntry.objects.get_or_create(
+        user=user, defaults={'rating': rating if rating is not None else INITIAL_RATING})
+    return entry, check(entry)
+
+
+def check(entry):
+    """
+    Return the game for an entry that has been paired, consuming the entry,
+    or retry pairing a waiting one.
+    """
+    if entry.game_id is not None:
+        entry.delete()
+        return entry.game
+    game = try_match(entry)
+    if game is None:
+        queue.add(entry.user_id, entry.rating)
+    return game
+
+
+def leave(user):
+    queue.remove(user.id)
+    return MatchmakingEntry.objects.filter(user=user, game__isnull=True).delete()[0] > 0
@@ -0,0 +1,51 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+    try:
+        return User.objects.get(**{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]},
+                                is_active=True)
+    except (KeyError, User.DoesNotExist):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Sets scope['user'] for WebSocket connections from a SimpleJWT access token.
+
+    Browsers cannot set headers on a WebSocket handshake, so the token is
+    read from the ``token`` query parameter, falling back to a
+    ``Authorization: Bearer <token>`` header for other clients.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = AnonymousUser()
+        raw_token = self.get_raw_token(scope)
+        if raw_token:
+            scope['user'] = await get_user_for_token(raw_token)
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_raw_token(scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+        for name, value in scope.get('headers', []):
+            if name == b'authorization':
+                parts = value.decode().split()
+                if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+                    return parts[1]
+        return None
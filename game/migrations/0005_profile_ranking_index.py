@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_game_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-games_won', 'user'], name='profile_ranking_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_profile_ranking_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userprofile',
+            name='profile_ranking_idx',
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating',
+            field=models.IntegerField(default=1200),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-rating', 'user'], name='profile_rating_idx'),
+        ),
+    ]
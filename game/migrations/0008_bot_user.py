@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import migrations
+
+
+# game.ai.BOT_USERNAME as of this migration
+BOT_USERNAME = 'computer'
+
+
+def create_bot_user(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserProfile = apps.get_model('game', 'UserProfile')
+    if User.objects.filter(username=BOT_USERNAME).exists():
+        raise RuntimeError(
+            f'A user named {BOT_USERNAME!r} already exists and would become the computer player. '
+            'Rename them, then migrate again.')
+    # An unusable password: nobody can log in as the computer player
+    bot = User.objects.create(username=BOT_USERNAME, password=make_password(None))
+    UserProfile.objects.get_or_create(user=bot)
+
+
+def delete_bot_user(apps, schema_editor):
+    apps.get_model('auth', 'User').objects.filter(username=BOT_USERNAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('game', '0007_matchmaking_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_bot_user, delete_bot_user),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:24
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import migrations, models
+
+from game.movelog import pack_cells, pack_times
+
+BATCH_SIZE = 1000
+
+
+def backfill_move_log(apps, schema_editor):
+    """Pack the existing Move rows of every game into its move log."""
+    Game = apps.get_model('game', 'Game')
+    Move = apps.get_model('game', 'Move')
+    rows = (
+        Move.objects.order_by('game_id', 'created_at', 'id')
+        .values_list('game_id', 'game__size', 'position_x', 'position_y', 'created_at')
+        .iterator(chunk_size=10000)
+    )
+    batch = []
+    for game_id, moves in groupby(rows, key=itemgetter(0)):
+        moves = list(moves)
+        size = moves[0][1]
+        batch.append(Game(
+            id=game_id,
+            move_log=pack_cells([x * size + y for _, _, x, y, _ in moves], size * size),
+            move_times=pack_times([created_at for *_, created_at in moves]),
+        ))
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, ['move_log', 'move_times'])
+            batch = []
+    Game.objects.bulk_update(batch, ['move_log', 'move_times'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_bot_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='move_log',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='move_times',
+            field=models.BinaryField(blank=True, default=bytes),
+        ),
+        migrations.RunPython(backfill_move_log, migrations.RunPython.noop),
+    ]
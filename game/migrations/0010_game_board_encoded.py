@@ -0,0 +1,61 @@
+from django.db import migrations
+
+import game.fields
+from game.fields import encode_board
+
+BATCH_SIZE = 1000
+
+
+def encode_boards(apps, schema_editor):
+    """Copy every list-of-lists board into the encoded column."""
+    Game = apps.get_model('game', 'Game')
+    batch = []
+    for game_id, board in Game.objects.values_list('id', 'board').iterator(chunk_size=10000):
+        batch.append(Game(id=game_id, encoded_board=encode_board(board or [])))
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, ['encoded_board'])
+            batch = []
+    Game.objects.bulk_update(batch, ['encoded_board'])
+
+
+def decode_boards(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    batch = []
+    for game_id, board in Game.objects.values_list('id', 'encoded_board').iterator(chunk_size=10000):
+        batch.append(Game(id=game_id, board=board.to_lists()))
+        if len(batch) == BATCH_SIZE:
+            Game.objects.bulk_update(batch, ['board'])
+            batch = []
+    Game.objects.bulk_update(batch, ['board'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_game_move_log'),
+    ]
+
+    # The JSON column can't be cast in place on every backend, so the
+    # encoded board is added alongside, filled, and then takes its name
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='encoded_board',
+            field=game.fields.BoardField(default='', max_length=361),
+        ),
+        migrations.RunPython(encode_boards, decode_boards),
+        migrations.RemoveField(
+            model_name='game',
+            name='board',
+        ),
+        migrations.RenameField(
+            model_name='game',
+            old_name='encoded_board',
+            new_name='board',
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='board',
+            field=game.fields.BoardField(db_index=True, default='', max_length=361),
+        ),
+    ]
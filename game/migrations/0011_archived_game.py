@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import game.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('game', '0010_game_board_encoded'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGame',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('board', game.fields.BoardField(default='', max_length=361)),
+                ('size', models.PositiveSmallIntegerField(default=3)),
+                ('win_length', models.PositiveSmallIntegerField(default=3)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('move_log', models.BinaryField(blank=True, default=bytes)),
+                ('move_times', models.BinaryField(blank=True, default=bytes)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(condition=models.Q(('status', 'ongoing')), fields=['created_at', 'id'], name='game_ongoing_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedgame',
+            name='player1',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedgame',
+            name='player2',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedgame',
+            name='winner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedgame',
+            index=models.Index(fields=['created_at', 'id'], name='archive_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedgame',
+            index=models.Index(fields=['player1', 'created_at', 'id'], name='archive_player1_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedgame',
+            index=models.Index(fields=['player2', 'created_at', 'id'], name='archive_player2_created_idx'),
+        ),
+    ]
@@ -1,29 +1,138 @@
+import zlib
+
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from .ai import BOT_USERNAME
+from .engine import Position, get_rules
+from .fields import BoardField
+from .movelog import logged_moves, uses_move_log
+from .rating import INITIAL_RATING, rating_delta, winner_side
+
+def make_game_etag(game_id, version, shape=''):
+    """ETag of a game representation; shape (see representation_shape) tells the ?fields/?expand variants apart."""
+    if shape:
+        return f'"{game_id}-{version}-{zlib.crc32(shape.encode()):08x}"'
+    return f'"{game_id}-{version}"'
 
 class Game(models.Model):
     player1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='games_as_player1')
     player2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='games_as_player2')
     current_turn = models.ForeignKey(User, on_delete=models.CASCADE, related_name='games_as_current_turn')
-    board = models.JSONField(default=list)  # Stores the 3x3 board as a list of lists
+    board = BoardField(default='', db_index=True)  # One 'X'/'O'/'.' per cell, row by row, see game.fields
+    size = models.PositiveSmallIntegerField(default=3)
+    win_length = models.PositiveSmallIntegerField(default=3)
     status = models.CharField(max_length=20, choices=[
         ('ongoing', 'Ongoing'),
         ('completed', 'Completed'),
     ], default='ongoing')
     winner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='games_won')
+    version = models.PositiveIntegerField(default=0)  # Bumped on every state change, used as the ETag
+    # Packed cell index and timestamp of every move, see game.movelog
+    move_log = models.BinaryField(default=bytes, blank=True)
+    move_times = models.BinaryField(default=bytes, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Keyset pagination walks these newest first, see game.pagination
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='game_created_idx'),
+            models.Index(fields=['player1', 'created_at', 'id'], name='game_player1_created_idx'),
+            models.Index(fields=['player2', 'created_at', 'id'], name='game_player2_created_idx'),
+            # Ongoing games are a small, hot fraction of the table
+            models.Index(fields=['created_at', 'id'], name='game_ongoing_idx', condition=Q(status='ongoing')),
+        ]
+
     def __str__(self):
         return f"Game {self.id}: {self.player1.username} vs {self.player2.username}"
 
+    @property
+    def rules(self):
+        return get_rules(self.size, self.win_length)
+
+    @property
+    def etag(self):
+        return make_game_etag(self.pk, self.version)
+
+    def save_if_current(self, **changes):
+        """
+        Optimistic write: UPDATE only the given columns, plus version and
+        updated_at, WHERE the version is still the one this instance was read
+        with. Returns False without writing anything if another request
+        changed the game first.
+        """
+        changes['version'] = self.version + 1
+        changes['updated_at'] = timezone.now()
+        if not Game.objects.filter(pk=self.pk, version=self.version).update(**changes):
+            return False
+        for name, value in changes.items():
+            setattr(self, name, value)
+        return True
+
+    def move_history(self):
+        """
+        The game's moves in play order: decoded from move_log when
+        GAME_MOVE_STORAGE is 'log', otherwise the Move rows (prefetched
+        ones are used when present).
+        """
+        if uses_move_log():
+            return logged_moves(self)
+        return list(self.moves.all())
+
     def save(self, *args, **kwargs):
         if not self.pk and not self.board:  # Only initialize board if it's a new game
-            self.board = [[None, None, None] for _ in range(3)]
+            self.board = Position(rules=self.rules).to_string()
         super().save(*args, **kwargs)
 
+class ArchivedGame(models.Model):
+    """
+    A completed game moved out of Game by `manage.py archive_games`, see
+    game.archive. It keeps the game's id, and its moves only as the packed
+    move log, so it has the attributes GameSerializer and
+    GameHistorySerializer read and is listed next to live games.
+    """
+    id = models.BigIntegerField(primary_key=True)  # The id it had as a Game
+    player1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    player2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    winner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    board = BoardField(default='')
+    size = models.PositiveSmallIntegerField(default=3)
+    win_length = models.PositiveSmallIntegerField(default=3)
+    version = models.PositiveIntegerField(default=0)
+    move_log = models.BinaryField(default=bytes, blank=True)
+    move_times = models.BinaryField(default=bytes, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    status = 'completed'
+    current_turn = current_turn_id = None
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='archive_created_idx'),
+            models.Index(fields=['player1', 'created_at', 'id'], name='archive_player1_created_idx'),
+            models.Index(fields=['player2', 'created_at', 'id'], name='archive_player2_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived game {self.id}: {self.player1.username} vs {self.player2.username}"
+
+    @property
+    def rules(self):
+        return get_rules(self.size, self.win_length)
+
+    @property
+    def etag(self):
+        return make_game_etag(self.pk, self.version)
+
+    def move_history(self):
+        return logged_moves(self)
+
 class Move(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='moves')
     player = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -44,27 +153,88 @@ class UserProfile(models.Model):
     games_won = models.IntegerField(default=0)
     games_lost = models.IntegerField(default=0)
     games_drawn = models.IntegerField(default=0)
+    rating = models.IntegerField(default=INITIAL_RATING)  # Elo, see game.rating
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Leaderboard order, backed by profile_rating_idx
+    RANKING_FIELD = 'rating'
+    RANKING_ORDER = ('-rating', 'user_id')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating', 'user'], name='profile_rating_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s profile"
 
-    def update_game_stats(self, result):
-        self.games_played += 1
-        if result == 'won':
-            self.games_won += 1
-        elif result == 'lost':
-            self.games_lost += 1
-        elif result == 'draw':
-            self.games_drawn += 1
-        self.save()
+    @classmethod
+    def record_game_result(cls, game):
+        """
+        Count a finished game and apply its Elo change for both players.
+
+        Counters and ratings are incremented with F() expressions inside the
+        database, so concurrent completions never overwrite each other. The
+        counter UPDATE runs first so the transaction holds the write lock
+        before the ratings are read; reading first would let SQLite fail the
+        later write with "database is locked" instead of waiting. Call it in
+        the transaction that completes the game. Games against the computer
+        player are counted but not rated. Returns
+        {user_id: (old_rating, new_rating)} for the leaderboard.
+        """
+        profiles = cls.objects.filter(user_id__in=(game.player1_id, game.player2_id))
+        winner_id = game.winner_id
+        if winner_id is None:
+            won = lost = Value(0)
+            drawn = 1
+        else:
+            won = Case(When(user_id=winner_id, then=Value(1)), default=Value(0))
+            lost = Case(When(user_id=winner_id, then=Value(0)), default=Value(1))
+            drawn = 0
+        profiles.update(
+            games_played=F('games_played') + 1,
+            games_won=F('games_won') + won,
+            games_lost=F('games_lost') + lost,
+            games_drawn=F('games_drawn') + drawn,
+            updated_at=timezone.now(),
+        )
 
+        rows = list(profiles.values_list('user_id', 'rating', 'user__username'))
+        if any(username == BOT_USERNAME for _, _, username in rows):
+            return {}
+        ratings = {user_id: rating for user_id, rating, _ in rows}
+        delta = rating_delta(
+            ratings.get(game.player1_id, INITIAL_RATING),
+            ratings.get(game.player2_id, INITIAL_RATING),
+            winner_side(game.player1_id, winner_id),
+        )
+        if delta:
+            profiles.update(rating=F('rating') + Case(
+                When(user_id=game.player1_id, then=Value(delta)), default=Value(-delta)))
+        return {
+            user_id: (rating, rating + (delta if user_id == game.player1_id else -delta))
+            for user_id, rating in ratings.items()
+        }
+
+class MatchmakingEntry(models.Model):
+    """
+    A player in the matchmaking queue. game is set when another player is
+    paired with them; the row is removed once they have picked it up. Rows
+    without a game are the queue, reloaded into memory after a restart.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='matchmaking_entry')
+    rating = models.IntegerField()
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} waiting at {self.rating}"
+
+# Only new users need a profile row. The profile is saved by whatever
+# changes it, so other User saves (logins updating last_login, password
+# changes) never touch the profile table
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
@@ -0,0 +1,85 @@
+"""
+Packed move log kept on Game.
+
+Game.move_log holds the cell index of every move in play order: one byte
+per move, or two (big-endian) on boards with more than 256 cells.
+Game.move_times holds when each move was made, as 8-byte microsecond
+timestamps. Both are appended in the same conditional UPDATE that writes
+the board. With GAME_MOVE_STORAGE = 'log', no Move rows are written and
+moves are served from the log. Players alternate, player1 first, so the log
+does not need to store who moved.
+"""
+import struct
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+TIME_FORMAT = '>q'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = datetime.resolution
+
+
+def uses_move_log():
+    return settings.GAME_MOVE_STORAGE == 'log'
+
+
+def cell_width(cells):
+    """Bytes per logged move on a board of cells cells."""
+    return 1 if cells <= 256 else 2
+
+
+def pack_cells(indexes, cells):
+    return b''.join(index.to_bytes(cell_width(cells), 'big') for index in indexes)
+
+
+def unpack_cells(log, cells):
+    log = bytes(log)
+    width = cell_width(cells)
+    if width == 1:
+        return list(log)
+    return [int.from_bytes(log[i:i + width], 'big') for i in range(0, len(log), width)]
+
+
+def pack_times(times):
+    return b''.join(struct.pack(TIME_FORMAT, (when - EPOCH) // _MICROSECOND) for when in times)
+
+
+def unpack_times(packed):
+    return [EPOCH + _MICROSECOND * micros for (micros,) in struct.iter_unpack(TIME_FORMAT, bytes(packed))]
+
+
+class LoggedMove:
+    """
+    A move read back from the log, with the attributes MoveSerializer and
+    the event payloads use. id is the move's 1-based number in the game.
+    """
+    __slots__ = ('id', 'game', 'player', 'position_x', 'position_y', 'created_at')
+
+    def __init__(self, id, game, player, position_x, position_y, created_at):
+        self.id = id
+        self.game = game
+        self.player = player
+        self.position_x = position_x
+        self.position_y = position_y
+        self.created_at = created_at
+
+    @property
+    def game_id(self):
+        return self.game.pk
+
+    @property
+    def player_id(self):
+        return self.player.pk
+
+
+def logged_moves(game):
+    """The game's moves, in play order, decoded from its log."""
+    size = game.size
+    indexes = unpack_cells(game.move_log, size * size)
+    times = unpack_times(game.move_times)
+    players = (game.player1, game.player2)
+    return [
+        LoggedMove(number, game, players[(number - 1) % 2], index // size, index % size,
+                   times[number - 1] if number <= len(times) else game.created_at)
+        for number, index in enumerate(indexes, start=1)
+    ]
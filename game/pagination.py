@@ -0,0 +1,134 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from operator import attrgetter
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (created_at, id), newest first by default.
+
+    The cursor is the (created_at, id) of the last row of the previous page,
+    so every page is a range scan starting at that key: page 500 costs the
+    same as page 1, unlike OFFSET. Only forward links are provided.
+
+    A listing that would need an OR filter (games where the user is player1
+    or player2) should be paginated with paginate_branches(), passing one
+    queryset per side. Each branch then scans its own (player, created_at,
+    id) index and the pages are merged, instead of the database sorting the
+    whole OR result.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_branches([queryset], request, view)
+
+    def paginate_branches(self, querysets, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        descending = self.ordering[0].startswith('-')
+        pages = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*self.ordering)
+            if cursor is not None:
+                created_at, pk = cursor
+                # The plain created_at bound is what lets the index be used as a range
+                if descending:
+                    queryset = queryset.filter(
+                        Q(created_at__lte=created_at),
+                        Q(created_at__lt=created_at) | Q(id__lt=pk),
+                    )
+                else:
+                    queryset = queryset.filter(
+                        Q(created_at__gte=created_at),
+                        Q(created_at__gt=created_at) | Q(id__gt=pk),
+                    )
+            pages.append(list(queryset[:page_size + 1]))
+
+        if len(pages) == 1:
+            rows = pages[0]
+        else:
+            rows = list(heapq.merge(*pages, key=attrgetter('created_at', 'id'), reverse=descending))
+        self.page = rows[:page_size]
+        self.has_next = len(rows) > page_size
+        return self.page
+
+    def paginate_sequence(self, rows, request, view=None):
+        """
+        Paginate rows already in memory and sorted by ordering, such as moves
+        decoded from a game's move log, with the same cursors.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            if self.ordering[0].startswith('-'):
+                rows = [row for row in rows if (row.created_at, row.id) < cursor]
+            else:
+                rows = [row for row in rows if (row.created_at, row.id) > cursor]
+        self.page = rows[:page_size]
+        self.has_next = len(rows) > page_size
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    @staticmethod
+    def encode_cursor(row):
+        raw = f'{row.created_at.isoformat()}|{row.id}'
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(encoded.encode()).decode().split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class MoveKeysetPagination(KeysetPagination):
+    """Moves of a game in the order they were played."""
+    page_size = 50
+    max_page_size = 500
+    ordering = ('created_at', 'id')
@@ -6,4 +6,4 @@ class IsGameParticipant(permissions.BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         # Only allow updates if the user is one of the players
-        return request.user == obj.player1 or request.user == obj.player2
+        return request.user.id in (obj.player1_id, obj.player2_id)
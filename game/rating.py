@@ -0,0 +1,29 @@
+"""
+Elo ratings.
+
+Deltas are rounded to whole points and applied as +delta / -delta, so every
+game is zero-sum and replaying the same games always gives the same
+ratings.
+"""
+
+INITIAL_RATING = 1200
+K_FACTOR = 32
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def rating_delta(player1_rating, player2_rating, winner):
+    """
+    Points player1 gains (player2 loses the same amount). winner is 1 or 2
+    for the winning side, or None for a draw.
+    """
+    score = 0.5 if winner is None else (1.0 if winner == 1 else 0.0)
+    return round(K_FACTOR * (score - expected_score(player1_rating, player2_rating)))
+
+
+def winner_side(player1_id, winner_id):
+    if winner_id is None:
+        return None
+    return 1 if winner_id == player1_id else 2
@@ -7,6 +7,15 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username')
 
+class BoardListField(serializers.Field):
+    """The encoded board column, shown as the list of rows the API has always returned."""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return value.to_lists()
+
 class MoveSerializer(serializers.ModelSerializer):
     player = UserSerializer(read_only=True)
 
@@ -15,17 +24,63 @@ class MoveSerializer(serializers.ModelSerializer):
         fields = ('id', 'game', 'player', 'position_x', 'position_y', 'created_at')
         read_only_fields = ('game', 'player')
 
-class GameSerializer(serializers.ModelSerializer):
+def split_param(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+def representation_shape(request):
+    """The request's ?fields and ?expand in a canonical form; '' for the default representation."""
+    fields = split_param(request.query_params.get('fields'))
+    expand = split_param(request.query_params.get('expand'))
+    if not fields and not expand:
+        return ''
+    return f"fields={','.join(sorted(fields))};expand={','.join(sorted(expand))}"
+
+class DynamicFieldsMixin:
+    """
+    Lets a request shape the representation: ?fields=id,status keeps only the
+    listed fields, and fields in Meta.expandable_fields are left out unless
+    asked for with ?expand=name.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        expand = split_param(request.query_params.get('expand'))
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                self.fields.pop(name, None)
+        only = split_param(request.query_params.get('fields'))
+        if only:
+            for name in set(self.fields) - only - expand:
+                self.fields.pop(name)
+
+class GameSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     player1 = UserSerializer(read_only=True)
     player2 = UserSerializer(read_only=True)
     current_turn = UserSerializer(read_only=True)
     winner = UserSerializer(read_only=True)
-    moves = MoveSerializer(many=True, read_only=True)
+    board = BoardListField()
+    moves = MoveSerializer(source='move_history', many=True, read_only=True)
 
     class Meta:
         model = Game
-        fields = ('id', 'player1', 'player2', 'current_turn', 'board', 'status', 'winner', 'created_at', 'updated_at', 'moves')
-        read_only_fields = ('board', 'status', 'winner')
+        fields = ('id', 'player1', 'player2', 'current_turn', 'board', 'size', 'win_length', 'status', 'winner', 'version', 'created_at', 'updated_at', 'moves')
+        read_only_fields = ('board', 'size', 'win_length', 'status', 'winner', 'version')
+        # Grows with the game; use ?expand=moves or the paginated games/{id}/moves/
+        expandable_fields = ('moves',)
+
+class GameStateSerializer(serializers.ModelSerializer):
+    """
+    Slim game state returned by make_move. Players are sent as ids, which
+    the client already knows from the full game representation.
+    """
+    board = BoardListField()
+
+    class Meta:
+        model = Game
+        fields = ('id', 'board', 'status', 'current_turn', 'winner', 'version', 'updated_at')
+        read_only_fields = fields
 
 class GameHistorySerializer(serializers.ModelSerializer):
     opponent = serializers.SerializerMethodField()
@@ -38,9 +93,10 @@ class GameHistorySerializer(serializers.ModelSerializer):
         model = Game
         fields = ('id', 'player1_name', 'player2_name', 'winner_name', 'opponent', 'result', 'created_at')
 
+    # Compare ids rather than User instances so no related object is fetched
     def get_opponent(self, obj):
         request = self.context.get('request')
-        if request.user == obj.player1:
+        if request.user.id == obj.player1_id:
             return UserSerializer(obj.player2).data
         return UserSerializer(obj.player1).data
 
@@ -48,9 +104,9 @@ class GameHistorySerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if obj.status != 'completed':
             return 'ongoing'
-        if obj.winner is None:
+        if obj.winner_id is None:
             return 'draw'
-        return 'won' if obj.winner == request.user else 'lost'
+        return 'won' if obj.winner_id == request.user.id else 'lost'
 
 class UserProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
@@ -59,15 +115,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ('username', 'bio', 'games_played', 'games_won', 'games_lost', 
-                 'games_drawn', 'win_rate', 'created_at', 'updated_at')
+                 'games_drawn', 'rating', 'win_rate', 'created_at', 'updated_at')
         read_only_fields = ('games_played', 'games_won', 'games_lost', 
-                          'games_drawn', 'created_at', 'updated_at')
+                          'games_drawn', 'rating', 'created_at', 'updated_at')
 
     def get_win_rate(self, obj):
         if obj.games_played == 0:
             return 0
         return round((obj.games_won / obj.games_played) * 100, 2)
 
+class LeaderboardEntrySerializer(UserProfileSerializer):
+    rank = serializers.SerializerMethodField()
+
+    class Meta(UserProfileSerializer.Meta):
+        fields = ('rank', 'username', 'rating', 'games_played', 'games_won', 'games_lost', 'games_drawn', 'win_rate')
+
+    def get_rank(self, obj):
+        return self.context['ranks'][obj.user_id]
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     bio = serializers.CharField(source='profile.bio', required=False)
 
@@ -0,0 +1,178 @@
+"""
+Solved 3x3 tablebase, stored in a file and memory-mapped.
+
+Every reachable position is folded onto its canonical form, the smallest
+base-3 code among its 8 rotations and reflections, and stored once. The file
+holds two byte arrays indexed by canonical code: the game-theoretic score
+for the side to move and the best move in the canonical orientation. Each
+worker maps the file read-only, so all workers on a host share one copy
+through the page cache, and a lookup is a handful of tuple indexes with no
+per-call objects beyond ints.
+
+Scores are from the side to move's point of view: positive is a win, zero
+a draw, negative a loss. A larger magnitude means a faster win or a slower
+loss: a win completed with n empty cells left scores n + 2.
+"""
+import mmap
+import os
+import threading
+from array import array
+
+from django.conf import settings
+
+from .engine import CELLS, FULL_MASK, O_DIGITS, SIZE, WINNING, X, X_DIGITS, iter_bits, side_to_move
+
+# TERNARY[mask] spreads a 3x3 mask into base 3, so a position's code is
+# TERNARY[x] + 2 * TERNARY[o]: one of 3**9 = 19683 slots
+TERNARY = tuple(sum(3 ** i for i in iter_bits(mask)) for mask in range(1 << CELLS))
+TABLE_SIZE = 3 ** CELLS
+UNREACHABLE = -128
+NO_MOVE = 0xFF
+
+
+def _transform(r, c, symmetry):
+    last = SIZE - 1
+    return (
+        (r, c), (c, last - r), (last - r, last - c), (last - c, r),
+        (r, last - c), (c, r), (last - r, c), (last - c, last - r),
+    )[symmetry]
+
+
+# PERMUTATIONS[s][i] is where the cell index i goes under symmetry s, and
+# INVERSE[s] undoes it; SYMMETRIC_MASKS[s][mask] applies s to a whole mask
+PERMUTATIONS = tuple(
+    tuple(r * SIZE + c for r, c in (_transform(i // SIZE, i % SIZE, s) for i in range(CELLS)))
+    for s in range(8)
+)
+INVERSE = tuple(
+    tuple(permutation.index(i) for i in range(CELLS))
+    for permutation in PERMUTATIONS
+)
+SYMMETRIC_MASKS = tuple(
+    tuple(sum(1 << permutation[i] for i in iter_bits(mask)) for mask in range(1 << CELLS))
+    for permutation in PERMUTATIONS
+)
+
+
+def canonical(x, o):
+    """(code, symmetry) of the smallest code among the 8 symmetric forms of (x, o)."""
+    best_code, best_symmetry = TABLE_SIZE, 0
+    for symmetry, masks in enumerate(SYMMETRIC_MASKS):
+        code = TERNARY[masks[x]] + 2 * TERNARY[masks[o]]
+        if code < best_code:
+            best_code, best_symmetry = code, symmetry
+    return best_code, best_symmetry
+
+
+def board_masks(encoded):
+    """X and O masks of an encoded 3x3 board, without building a Position; '' is the empty board."""
+    return (int(encoded.translate(X_DIGITS)[::-1] or '0', 2),
+            int(encoded.translate(O_DIGITS)[::-1] or '0', 2))
+
+
+def solve():
+    """Score and best canonical move for every reachable canonical position."""
+    values = array('b', [UNREACHABLE]) * TABLE_SIZE
+    moves = bytearray([NO_MOVE]) * TABLE_SIZE
+
+    def negamax(x, o):
+        code, symmetry = canonical(x, o)
+        if values[code] != UNREACHABLE:
+            return values[code]
+        masks = SYMMETRIC_MASKS[symmetry]
+        x, o = masks[x], masks[o]
+        x_to_move = side_to_move(x, o) == X
+        mover, other = (x, o) if x_to_move else (o, x)
+        empty = ~(x | o) & FULL_MASK
+        if WINNING[other]:
+            best_score, best_move = -(2 + bin(empty).count('1')), NO_MOVE
+        elif not empty:
+            best_score, best_move = 0, NO_MOVE
+        else:
+            best_score, best_move = None, NO_MOVE
+            for index in iter_bits(empty):
+                played = mover | 1 << index
+                score = -(negamax(played, other) if x_to_move else negamax(other, played))
+                if best_score is None or score > best_score:
+                    best_score, best_move = score, index
+        values[code] = best_score
+        moves[code] = best_move
+        return best_score
+
+    negamax(0, 0)
+    return values.tobytes(), bytes(moves)
+
+
+def write_tablebase(path):
+    """Solve and write the table to path atomically, so readers never see a partial file."""
+    values, moves = solve()
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(values)
+        handle.write(moves)
+    os.replace(temporary, path)
+
+
+class Tablebase:
+    """Read-only view of the tablebase file, created on first use if missing."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._values = None
+        self._moves = None
+
+    @property
+    def path(self):
+        return self._path or settings.TABLEBASE_PATH
+
+    def _ensure_loaded(self):
+        if self._values is not None:
+            return
+        with self._lock:
+            if self._values is not None:
+                return
+            path = str(self.path)
+            if not os.path.exists(path):
+                write_tablebase(path)
+            with open(path, 'rb') as handle:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(mapped) != 2 * TABLE_SIZE:
+                raise ValueError(f'{path} is not a tablebase file')
+            view = memoryview(mapped)
+            self._moves = view[TABLE_SIZE:]
+            self._values = view[:TABLE_SIZE].cast('b')
+
+    def score(self, x, o):
+        """Score of (x, o) for the side to move, or None if it cannot occur in a game."""
+        self._ensure_loaded()
+        value = self._values[canonical(x, o)[0]]
+        return None if value == UNREACHABLE else value
+
+    def best_move(self, x, o):
+        """Cell index of the best move in (x, o), or None once the game is over."""
+        self._ensure_loaded()
+        code, symmetry = canonical(x, o)
+        move = self._moves[code]
+        return None if move == NO_MOVE else INVERSE[symmetry][move]
+
+    def move_scores(self, x, o):
+        """Yield (index, score) for every legal move, scored for the side to move."""
+        self._ensure_loaded()
+        if WINNING[x] or WINNING[o]:
+            return
+        values = self._values
+        x_to_move = side_to_move(x, o) == X
+        for index in iter_bits(~(x | o) & FULL_MASK):
+            bit = 1 << index
+            code = canonical(x | bit, o)[0] if x_to_move else canonical(x, o | bit)[0]
+            yield index, -values[code]
+
+
+tablebase = Tablebase()
+
+
+def describe(score):
+    return 'win' if score > 0 else 'draw' if score == 0 else 'loss'
@@ -1,3 +1,1105 @@
-from django.test import TestCase
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+from io import StringIO
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tictactoe.asgi import application
+
+from .ai import BOT_USERNAME, choose_move
+from .authentication import UserCache, user_cache
+from .engine import EMPTY_CELL, O, X, Position, get_rules
+from .events import MoveNotifier
+from .fields import Board
+from .leaderboard import leaderboard
+from .movelog import pack_cells, unpack_cells
+from .matchmaking import MatchmakingQueue, queue as matchmaking_queue, try_match
+from .rating import rating_delta
+from .tablebase import SYMMETRIC_MASKS, Tablebase, tablebase
+from .throttling import MemoryBucketStore, SQLiteBucketStore, bucket_store
+from .models import ArchivedGame, Game, MatchmakingEntry, Move, UserProfile
+
+
+class EngineTests(TestCase):
+    def test_standard_board_round_trip(self):
+        board = [['X', None, 'O'], [None, 'X', None], ['O', None, 'X']]
+        position = Position.from_board(board)
+        self.assertEqual(position.to_board(), board)
+        self.assertEqual(position.winner(), X)
+        self.assertEqual(position.legal_moves(), [1, 3, 5, 7])
+
+    def test_draw(self):
+        board = [['X', 'O', 'X'], ['X', 'O', 'O'], ['O', 'X', 'X']]
+        position = Position.from_board(board)
+        self.assertIsNone(position.winner())
+        self.assertTrue(position.is_draw())
+
+    def test_incremental_win_matches_full_scan(self):
+        rules = get_rules(15, 5)
+        position = Position(rules=rules)
+        # Anti-diagonal from (2, 10) down to (6, 6)
+        for step in range(5):
+            index = rules.cell_index(2 + step, 10 - step)
+            self.assertFalse(position.has_won(O))
+            position = position.play(index, O)
+        self.assertTrue(position.is_winning_move(index, O))
+        self.assertTrue(position.has_won(O))
+
+    def test_lines_do_not_wrap_around_rows(self):
+        rules = get_rules(5, 4)
+        position = Position(rules=rules)
+        for x, y in ((0, 3), (0, 4), (1, 0), (1, 1)):
+            index = rules.cell_index(x, y)
+            position = position.play(index, X)
+        self.assertFalse(position.is_winning_move(index, X))
+        self.assertFalse(position.has_won(X))
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            get_rules(3, 4)
+        with self.assertRaises(ValueError):
+            get_rules(20, 5)
+
+
+class GameApiTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        # Users ids are reused once a test rolls back, so buckets must not carry over
+        bucket_store().reset()
+        self.player1 = User.objects.create_user('alice')
+        self.player2 = User.objects.create_user('bob')
+        self.client1 = APIClient()
+        self.client1.force_authenticate(self.player1)
+        self.client2 = APIClient()
+        self.client2.force_authenticate(self.player2)
+        # force_authenticate only reaches DRF views; the async wait view reads the token
+        self.client1.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.player1)}')
+        self.client2.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.player2)}')
+
+    def create_game(self, **data):
+        response = self.client1.post('/api/games/', {'player2_id': self.player2.id, **data}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def move(self, client, game_id, x, y):
+        return client.post(f'/api/games/{game_id}/make_move/',
+                           {'position_x': x, 'position_y': y}, format='json')
+
+    def seed_games(self, count):
+        """Completed games between player1 and fresh opponents, two moves each."""
+        for i in range(count):
+            opponent = User.objects.create_user(f'opponent{Game.objects.count()}')
+            game = Game.objects.create(player1=self.player1, player2=opponent, current_turn=opponent,
+                                       status='completed', winner=self.player1 if i % 2 else None)
+            Move.objects.create(game=game, player=self.player1, position_x=0, position_y=0)
+            Move.objects.create(game=game, player=opponent, position_x=1, position_y=1)
+
+    def play(self, game_id, moves):
+        """Alternate moves between player1 and player2, returning the last response."""
+        clients = (self.client1, self.client2)
+        for turn, (x, y) in enumerate(moves):
+            response = self.move(clients[turn % 2], game_id, x, y)
+            self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+
+class GameVariantTests(GameApiTestCase):
+    def test_default_game_is_3x3(self):
+        game = Game.objects.get(pk=self.create_game())
+        self.assertEqual((game.size, game.win_length), (3, 3))
+        self.assertEqual(game.board, [[None] * 3 for _ in range(3)])
+
+    def test_gomoku_win(self):
+        game_id = self.create_game(size=15, win_length=5)
+        moves = []
+        for step in range(5):
+            moves.append((7, 3 + step))
+            if step < 4:
+                moves.append((0, step))
+        self.play(game_id, moves)
+        game = Game.objects.get(pk=game_id)
+        self.assertEqual(game.status, 'completed')
+        self.assertEqual(game.winner, self.player1)
+
+    def test_out_of_bounds_move(self):
+        game_id = self.create_game(size=4, win_length=3)
+        self.assertEqual(self.move(self.client1, game_id, 3, 3).status_code, 200)
+        self.assertEqual(self.move(self.client2, game_id, 4, 0).status_code, 400)
+
+    def test_invalid_size(self):
+        response = self.client1.post('/api/games/', {'player2_id': self.player2.id, 'size': 3, 'win_length': 5},
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class GameStateResponseTests(GameApiTestCase):
+    def test_make_move_returns_slim_state(self):
+        game_id = self.create_game()
+        response = self.move(self.client1, game_id, 1, 1)
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(response.data['board'][1][1], 'X')
+        self.assertEqual(response.data['current_turn'], self.player2.id)
+        self.assertNotIn('moves', response.data)
+        self.assertEqual(response['ETag'], f'"{game_id}-1"')
+
+    def test_conditional_retrieve(self):
+        game_id = self.create_game()
+        etag = self.client1.get(f'/api/games/{game_id}/')['ETag']
+        response = self.client1.get(f'/api/games/{game_id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.move(self.client1, game_id, 0, 0)
+        response = self.client1.get(f'/api/games/{game_id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_fields_and_expand(self):
+        game_id = self.create_game()
+        etag = self.client1.get(f'/api/games/{game_id}/')['ETag']
+        for query in ('?fields=id,status', '?expand=moves'):
+            response = self.client1.get(f'/api/games/{game_id}/{query}', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+        etag = self.client1.get(f'/api/games/{game_id}/?fields=id,status')['ETag']
+        response = self.client1.get(f'/api/games/{game_id}/?fields=status,id', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class LongPollTests(GameApiTestCase):
+    def test_returns_only_newer_moves(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 1), (2, 2)])
+        response = self.client2.get(f'/api/games/{game_id}/wait/?after_move=1')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([(m['position_x'], m['position_y']) for m in data['moves']], [(1, 1), (2, 2)])
+        self.assertEqual((data['status'], data['version']), ('ongoing', 3))
+
+    def test_times_out_without_new_moves(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0)])
+        start = time.monotonic()
+        response = self.client1.get(f'/api/games/{game_id}/wait/?after_move=1&timeout=0.2')
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(response.json()['moves'], [])
+
+    def test_rejects_timeout_that_is_not_finite(self):
+        game_id = self.create_game()
+        for timeout in ('nan', 'inf', 'x'):
+            response = self.client1.get(f'/api/games/{game_id}/wait/?timeout={timeout}')
+            self.assertEqual(response.status_code, 400)
+
+    def test_requires_authentication(self):
+        game_id = self.create_game()
+        self.assertEqual(APIClient().get(f'/api/games/{game_id}/wait/?timeout=0').status_code, 401)
+        self.assertEqual(self.client1.get('/api/games/999/wait/?timeout=0').status_code, 404)
+
+    async def test_notifier_wakes_listener(self):
+        notifier = MoveNotifier()
+        with notifier.listen(1) as listener:
+            # Notified from another thread, as make_move's on_commit does
+            threading.Timer(0.05, notifier.notify, args=(1,)).start()
+            start = time.monotonic()
+            self.assertTrue(await listener.wait(5))
+            self.assertLess(time.monotonic() - start, 1)
+            # A change made before the wait starts is not lost
+            notifier.notify(1)
+            await asyncio.sleep(0)
+            self.assertTrue(await listener.wait(0.1))
+            self.assertFalse(await listener.wait(0))
+        self.assertEqual(notifier._entries, {})
+
+
+class QueryCountTests(GameApiTestCase):
+    """The listing endpoints must not issue more queries as history grows."""
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client1.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        self.seed_games(2)
+        few = self.count_queries(url)
+        self.seed_games(10)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_game_list(self):
+        self.assertConstantQueries('/api/games/')
+
+    def test_my_games(self):
+        self.assertConstantQueries('/api/games/my_games/')
+
+    def test_match_history(self):
+        self.assertConstantQueries('/api/match-history/')
+
+    def test_game_list_with_moves(self):
+        self.assertConstantQueries('/api/games/?expand=moves')
+
+    def test_retrieve(self):
+        self.seed_games(1)
+        game = Game.objects.get()
+        url = f'/api/games/{game.id}/?expand=moves'
+        few = self.count_queries(url)
+        for _ in range(5):
+            Move.objects.create(game=game, player=self.player2, position_x=2, position_y=2)
+        self.assertEqual(self.count_queries(url), few)
+
+
+class CachedAuthenticationTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client1 = APIClient()
+        self.client1.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.player1)}')
+
+    def user_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client1, method)(url, **kwargs)
+        self.assertLess(response.status_code, 300, response.data)
+        return [query['sql'] for query in queries if 'FROM "auth_user"' in query['sql']]
+
+    def test_make_move_and_retrieve_need_no_user_queries(self):
+        game_id = self.create_game()
+        self.assertEqual(self.user_queries('post', f'/api/games/{game_id}/make_move/',
+                                           data={'position_x': 0, 'position_y': 0}, format='json'), [])
+        self.assertEqual(self.user_queries('get', f'/api/games/{game_id}/'), [])
+
+    def test_saving_user_invalidates(self):
+        self.assertEqual(self.client1.get('/api/games/').status_code, 200)
+        self.player1.is_active = False
+        self.player1.save()
+        self.assertEqual(self.client1.get('/api/games/').status_code, 401)
+
+    def test_cache_is_bounded_and_expires(self):
+        cache = UserCache(maxsize=1, ttl=60)
+        self.assertEqual(cache.get(self.player1.id), self.player1)
+        self.assertIsNot(cache.get(self.player1.id), cache.get(self.player1.id))
+        cache.get(self.player2.id)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get(0))
+
+        cache = UserCache(maxsize=10, ttl=0)
+        cache.get(self.player1.id)
+        with self.assertNumQueries(1):
+            cache.get(self.player1.id)
+
+    def test_invalidation_during_fetch_is_not_undone(self):
+        cache = UserCache(maxsize=10, ttl=60)
+
+        def invalidating(execute, sql, params, many, context):
+            # The user is saved elsewhere while this read is in flight
+            cache.invalidate(self.player1.id)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(invalidating):
+            self.assertEqual(cache.get(self.player1.id), self.player1)
+        self.assertEqual(len(cache), 0)
+        cache.get(self.player1.id)
+        self.assertEqual(len(cache), 1)
+
+
+class ThrottleTests(GameApiTestCase):
+    def check_bucket(self, store, clock):
+        clock[0] = 1000.0
+        self.assertEqual([store.take('k', 3, 1.0) for _ in range(4)], [0, 0, 0, 1.0])
+        clock[0] += 0.5
+        self.assertAlmostEqual(store.take('k', 3, 1.0), 0.5)
+        clock[0] += 0.5
+        self.assertEqual(store.take('k', 3, 1.0), 0)
+        store.take('other', 3, 1.0)
+        clock[0] += 3
+        store.evict()
+        self.assertEqual(len(store), 0)
+
+    def test_memory_store(self):
+        clock = [0.0]
+        store = MemoryBucketStore(evict_interval=60)
+        store.timer = lambda: clock[0]
+        self.check_bucket(store, clock)
+
+    def test_sqlite_store(self):
+        clock = [0.0]
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteBucketStore(os.path.join(directory, 'throttle.sqlite3'), evict_interval=60)
+            store.timer = lambda: clock[0]
+            self.check_bucket(store, clock)
+
+    def test_make_move_is_throttled_per_user(self):
+        rates = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'make_move': '2/min'}}
+        with override_settings(REST_FRAMEWORK=rates):
+            game_id = self.create_game(size=5, win_length=5)
+            self.play(game_id, [(0, 0), (1, 0), (0, 1), (1, 1)])
+            response = self.move(self.client1, game_id, 0, 2)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+            other = APIClient()
+            other.force_authenticate(User.objects.create_user('carol'))
+            response = other.post('/api/games/', {'player2_id': self.player1.id}, format='json')
+            self.assertEqual(self.move(other, response.data['id'], 0, 0).status_code, 200)
+
+    def test_token_is_throttled_per_ip(self):
+        rates = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'token': '1/min'}}
+        with override_settings(REST_FRAMEWORK=rates):
+            credentials = {'username': 'alice', 'password': 'wrong'}
+            self.assertEqual(APIClient().post('/api/token/', credentials).status_code, 401)
+            self.assertEqual(APIClient().post('/api/token/', credentials).status_code, 429)
+            self.assertEqual(APIClient(REMOTE_ADDR='10.0.0.2').post('/api/token/', credentials).status_code, 401)
+
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        rates = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'token': '1/min'}}
+        with override_settings(REST_FRAMEWORK=rates):
+            credentials = {'username': 'alice', 'password': 'wrong'}
+            statuses = [APIClient(HTTP_X_FORWARDED_FOR=f'10.1.0.{i}').post('/api/token/', credentials).status_code
+                        for i in range(3)]
+            self.assertEqual(statuses, [401, 429, 429])
+
+
+class SparseFieldsTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.game_id = self.create_game()
+        self.play(self.game_id, [(0, 0), (1, 1), (2, 2)])
+
+    def test_moves_are_opt_in(self):
+        response = self.client1.get(f'/api/games/{self.game_id}/')
+        self.assertNotIn('moves', response.data)
+        response = self.client1.get(f'/api/games/{self.game_id}/?expand=moves')
+        self.assertEqual(len(response.data['moves']), 3)
+
+    def test_fields(self):
+        response = self.client1.get(f'/api/games/{self.game_id}/?fields=id,status')
+        self.assertEqual(set(response.data), {'id', 'status'})
+        response = self.client1.get(f'/api/games/?fields=id,board&expand=moves')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'board', 'moves'})
+
+    def test_paginated_moves(self):
+        response = self.client1.get(f'/api/games/{self.game_id}/moves/?page_size=2')
+        self.assertEqual([(m['position_x'], m['position_y']) for m in response.data['results']], [(0, 0), (1, 1)])
+        response = self.client1.get(response.data['next'])
+        self.assertEqual([(m['position_x'], m['position_y']) for m in response.data['results']], [(2, 2)])
+        self.assertIsNone(response.data['next'])
+
+
+class PaginationTests(GameApiTestCase):
+    def test_cursor_walks_history_once_newest_first(self):
+        self.seed_games(7)
+        Game.objects.create(player1=self.player2, player2=self.player1, current_turn=self.player2)
+        # Same created_at for several games exercises the id tie-break
+        Game.objects.filter(id__in=Game.objects.order_by('id').values('id')[2:5]).update(
+            created_at=Game.objects.order_by('id')[2].created_at)
+        expected = list(Game.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        for url in ('/api/games/my_games/?page_size=3', '/api/match-history/?page_size=3', '/api/games/?page_size=3'):
+            seen = []
+            while url:
+                response = self.client1.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(response.data['results']), 3)
+                seen += [game['id'] for game in response.data['results']]
+                url = response.data['next']
+            self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client1.get('/api/match-history/?cursor=nope').status_code, 404)
+
+
+class PlayerStatsTests(GameApiTestCase):
+    def stats(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return profile.games_played, profile.games_won, profile.games_lost, profile.games_drawn
+
+    def test_win_updates_both_profiles(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        self.assertEqual(self.stats(self.player1), (1, 1, 0, 0))
+        self.assertEqual(self.stats(self.player2), (1, 0, 1, 0))
+
+    def test_draw_updates_both_profiles(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)])
+        self.assertEqual(self.stats(self.player1), (1, 0, 0, 1))
+        self.assertEqual(self.stats(self.player2), (1, 0, 0, 1))
+
+    def test_constant_statements_per_completion(self):
+        game = Game.objects.create(player1=self.player1, player2=self.player2, current_turn=self.player1,
+                                   status='completed', winner=self.player2)
+        # Counters UPDATE, ratings SELECT, ratings UPDATE; each covers both players
+        with self.assertNumQueries(3):
+            changes = UserProfile.record_game_result(game)
+        self.assertEqual(self.stats(self.player2), (1, 1, 0, 0))
+        self.assertEqual(changes, {self.player1.id: (1200, 1184), self.player2.id: (1200, 1216)})
+
+
+class ProfilePersistenceTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # As authentication does, with no profile cached on the instance
+        self.client1.force_authenticate(User.objects.get(pk=self.player1.pk))
+
+    def test_user_save_leaves_profile_alone(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.player1.last_login = timezone.now()
+            self.player1.save(update_fields=['last_login'])
+        self.assertFalse([query for query in queries if 'game_userprofile' in query['sql']])
+
+    def test_me_reads_profile_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client1.get('/api/profile/me/')
+        self.assertEqual((response.data['username'], response.data['games_played']), ('alice', 0))
+
+    def test_me_creates_missing_profile(self):
+        UserProfile.objects.filter(user=self.player1).delete()
+        self.assertEqual(self.client1.get('/api/profile/me/').data['rating'], 1200)
+        self.assertTrue(UserProfile.objects.filter(user=self.player1).exists())
+
+
+class RatingTests(GameApiTestCase):
+    def test_rating_delta_is_zero_sum(self):
+        self.assertEqual(rating_delta(1200, 1200, 1), 16)
+        self.assertEqual(rating_delta(1200, 1200, None), 0)
+        self.assertEqual(rating_delta(1400, 1200, 2), -24)
+        self.assertEqual(rating_delta(1400, 1200, None), -8)
+
+    def test_recompute_matches_incremental_updates(self):
+        for moves in ([(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)],
+                      [(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)],
+                      [(1, 1), (0, 0), (2, 2), (0, 1), (2, 0), (0, 2)]):
+            self.play(self.create_game(), moves)
+        incremental = dict(UserProfile.objects.values_list('user_id', 'rating'))
+        self.assertNotEqual(incremental[self.player1.id], 1200)
+
+        UserProfile.objects.update(rating=1000)
+        call_command('recompute_ratings', chunk_size=2, batch_size=1, stdout=StringIO())
+        self.assertEqual(dict(UserProfile.objects.values_list('user_id', 'rating')), incremental)
+
+
+class LeaderboardTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, wins in (('carol', 10), ('dave', 3), ('erin', 3)):
+            user = User.objects.create_user(name)
+            UserProfile.objects.filter(user=user).update(rating=1200 + wins * 10)
+        leaderboard.invalidate()
+
+    def tearDown(self):
+        leaderboard.invalidate()
+
+    def test_top_and_my_rank(self):
+        response = self.client1.get('/api/leaderboard/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(e['rank'], e['username']) for e in response.data['results']],
+                         [(1, 'carol'), (2, 'dave'), (2, 'erin')])
+        self.assertEqual(response.data['me']['rank'], 4)
+
+    def test_completed_game_patches_cached_ranking(self):
+        self.client1.get('/api/leaderboard/')
+        game_id = self.create_game()
+        UserProfile.objects.filter(user=self.player1).update(rating=1230)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.play(game_id, [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        with self.assertNumQueries(2):
+            response = self.client1.get('/api/leaderboard/')
+        # alice's cached 1200 is replaced, not kept next to her new rating
+        self.assertEqual([(e['rank'], e['username']) for e in response.data['results']],
+                         [(1, 'carol'), (2, 'alice'), (3, 'dave'), (3, 'erin'), (5, 'bob')])
+        self.assertEqual(response.data['me']['rank'], 2)
+
+    def test_new_and_deleted_players(self):
+        self.client1.get('/api/leaderboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('frank')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(username='dave').delete()
+        response = self.client1.get('/api/leaderboard/')
+        self.assertEqual([(e['rank'], e['username']) for e in response.data['results']],
+                         [(1, 'carol'), (2, 'erin'), (3, 'alice'), (3, 'bob'), (3, 'frank')])
+        self.assertEqual(len(leaderboard), 5)
+
+
+class MatchmakingTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        matchmaking_queue.reset()
+
+    def tearDown(self):
+        matchmaking_queue.reset()
+
+    def test_waiting_player_is_paired_with_next_joiner(self):
+        response = self.client1.post('/api/matchmaking/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'waiting')
+
+        response = self.client2.post('/api/matchmaking/')
+        self.assertEqual(response.status_code, 201)
+        game = response.data['game']
+        self.assertEqual((game['player1']['id'], game['player2']['id']), (self.player1.id, self.player2.id))
+        self.assertEqual(game['current_turn']['id'], self.player1.id)
+
+        response = self.client1.get('/api/matchmaking/')
+        self.assertEqual(response.data['status'], 'matched')
+        self.assertEqual(response.data['game']['id'], game['id'])
+        self.assertFalse(MatchmakingEntry.objects.exists())
+        self.assertEqual(self.client1.get('/api/matchmaking/').status_code, 404)
+
+    def test_rating_gap_and_leaving(self):
+        UserProfile.objects.filter(user=self.player2).update(rating=1500)
+        self.client1.post('/api/matchmaking/')
+        self.assertEqual(self.client2.post('/api/matchmaking/').status_code, 202)
+        self.assertEqual(self.client1.delete('/api/matchmaking/').status_code, 204)
+        self.assertEqual(self.client1.delete('/api/matchmaking/').status_code, 404)
+        self.assertFalse(Game.objects.exists())
+
+    def test_queue_is_reloaded_from_database(self):
+        self.client1.post('/api/matchmaking/')
+        matchmaking_queue.reset()  # as after a restart
+        self.assertEqual(self.client2.post('/api/matchmaking/').status_code, 201)
+
+    def test_entry_paired_meanwhile_is_consumed(self):
+        self.client1.post('/api/matchmaking/')
+        entry = MatchmakingEntry.objects.create(user=self.player2, rating=1200)
+        # Another worker pairs the entry after this one loaded it
+        game_id = self.create_game()
+        MatchmakingEntry.objects.filter(pk=entry.pk).update(game_id=game_id)
+        self.assertEqual(try_match(entry).id, game_id)
+        self.assertFalse(MatchmakingEntry.objects.filter(pk=entry.pk).exists())
+        self.assertEqual(self.client2.get('/api/matchmaking/').status_code, 404)
+
+    def test_closest_rating_first(self):
+        queue = MatchmakingQueue()
+        for user_id, rating in ((1, 1000), (2, 1190), (3, 1230), (4, 1600)):
+            MatchmakingEntry.objects.create(user=User.objects.create_user(f'queued{user_id}'), rating=rating)
+        self.assertEqual(len(queue), 4)
+        ids = dict(MatchmakingEntry.objects.values_list('rating', 'user_id'))
+        self.assertEqual(queue.closest(1200, 100, exclude=None), [ids[1190], ids[1230]])
+        queue.remove(ids[1190])
+        self.assertEqual(queue.closest(1200, 250, exclude=ids[1230]), [ids[1000]])
+
+    def test_ids_beyond_32_bits(self):
+        queue = MatchmakingQueue()
+        len(queue)
+        queue.add(2 ** 40 + 1, 1210)
+        queue.add(3, 1195)
+        self.assertEqual(queue.closest(1200, 50, exclude=None), [3, 2 ** 40 + 1])
+        queue.remove(2 ** 40 + 1)
+        self.assertEqual(len(queue), 1)
+
+
+class TablebaseTests(TestCase):
+    def test_file_is_written_and_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            table = Tablebase(os.path.join(directory, 'table.bin'))
+            self.assertEqual(table.score(0, 0), 0)
+            self.assertTrue(os.path.exists(table.path))
+
+    def test_symmetric_positions_agree(self):
+        position = Position.from_board([['X', None, None], [None, 'O', None], [None, None, 'X']])
+        scores = {tablebase.score(masks[position.x], masks[position.o]) for masks in SYMMETRIC_MASKS}
+        self.assertEqual(len(scores), 1)
+        # The stored best move maps back to each orientation and keeps the value
+        for masks in SYMMETRIC_MASKS:
+            x, o = masks[position.x], masks[position.o]
+            move = tablebase.best_move(x, o)
+            self.assertFalse((x | o) >> move & 1)
+            self.assertEqual(-tablebase.score(x, o | 1 << move), tablebase.score(x, o))
+
+
+class AnalysisTests(GameApiTestCase):
+    def test_scores_every_legal_move(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (0, 1)])
+        response = self.client1.get(f'/api/games/{game_id}/analysis/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['to_move'], response.data['value']), ('X', 'win'))
+        self.assertEqual(len(response.data['moves']), 7)
+        best = response.data['moves'][0]
+        self.assertEqual(best['value'], 'win')
+        self.assertEqual(best['score'], response.data['score'])
+        scores = [move['score'] for move in response.data['moves']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_finished_game_and_large_board(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        response = self.client2.get(f'/api/games/{game_id}/analysis/')
+        self.assertEqual((response.data['value'], response.data['moves']), ('loss', []))
+
+        game_id = self.create_game(size=5, win_length=4)
+        self.assertEqual(self.client1.get(f'/api/games/{game_id}/analysis/').status_code, 400)
+        self.assertEqual(self.client1.get('/api/games/999/analysis/').status_code, 404)
+
+    def test_empty_board_string(self):
+        game_id = self.create_game()
+        Game.objects.filter(pk=game_id).update(board='')  # Legacy default
+        response = self.client1.get(f'/api/games/{game_id}/analysis/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['to_move'], response.data['value'], len(response.data['moves'])),
+                         ('X', 'draw', 9))
+
+
+class BotTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bot = User.objects.get(username=BOT_USERNAME)
+
+    def test_tablebase_reply(self):
+        # X to move with two open lines wins by completing the top row
+        position = Position.from_board([['X', 'X', None], ['O', 'O', None], [None, None, None]])
+        self.assertEqual(choose_move(position), 2)
+
+    def test_search_blocks_open_line_on_large_board(self):
+        rules = get_rules(9, 4)
+        position = Position(rules=rules)
+        for index, symbol in ((40, X), (0, O), (41, X), (8, O), (42, X)):
+            position = position.play(index, symbol)
+        self.assertIn(choose_move(position, time_budget=1, max_depth=2), (39, 43))
+
+    def test_bot_replies_in_make_move_response(self):
+        response = self.client1.post('/api/games/', {'player2_id': self.bot.id}, format='json')
+        game_id = response.data['id']
+        response = self.move(self.client1, game_id, 0, 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['current_turn'], self.player1.id)
+        self.assertEqual(response.data['board'], [['X', None, None], [None, 'O', None], [None, None, None]])
+        self.assertEqual(Move.objects.filter(game_id=game_id, player=self.bot).count(), 1)
+
+    def test_conflicting_reply_returns_committed_state(self):
+        game_id = self.client1.post('/api/games/', {'player2_id': self.bot.id}, format='json').data['id']
+
+        def racing_choose_move(position):
+            # Another request changes the game while the reply is chosen
+            Game.objects.filter(pk=game_id).update(version=F('version') + 1)
+            return choose_move(position)
+
+        with mock.patch('game.views.choose_move', racing_choose_move):
+            response = self.move(self.client1, game_id, 0, 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['current_turn'], response.data['version']), (self.bot.id, 2))
+        self.assertEqual(response.data['board'][0][0], 'X')
+
+    def test_bot_never_loses(self):
+        response = self.client1.post('/api/games/', {'player2_id': self.bot.id}, format='json')
+        game_id = response.data['id']
+        for x, y in ((0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)):
+            if Game.objects.get(pk=game_id).status != 'ongoing':
+                break
+            self.move(self.client1, game_id, x, y)
+        game = Game.objects.get(pk=game_id)
+        self.assertEqual(game.status, 'completed')
+        self.assertNotEqual(game.winner_id, self.player1.id)
+
+    def test_bot_games_are_counted_but_not_rated(self):
+        game_id = self.client1.post('/api/games/', {'player2_id': self.bot.id}, format='json').data['id']
+        for x, y in ((0, 0), (0, 1), (1, 0), (2, 2), (2, 1)):
+            if Game.objects.get(pk=game_id).status != 'ongoing':
+                break
+            self.move(self.client1, game_id, x, y)
+        self.assertEqual(Game.objects.get(pk=game_id).status, 'completed')
+        profile = UserProfile.objects.get(user=self.player1)
+        self.assertEqual((profile.games_played, profile.rating), (1, 1200))
+        self.assertEqual(UserProfile.objects.get(user=self.bot).rating, 1200)
+        call_command('recompute_ratings', stdout=StringIO())
+        self.assertEqual(UserProfile.objects.get(user=self.bot).rating, 1200)
+
+
+class ExportTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.player1.is_staff = True
+        self.player1.save()
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        self.seed_games(2)
+
+    def read_export(self, query=''):
+        response = self.client1.get(f'/api/games/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_streams_games_with_moves(self):
+        games = self.read_export()
+        self.assertEqual(len(games), 3)
+        self.assertEqual((games[0]['player2'], games[0]['winner']), ('bob', 'alice'))
+        self.assertEqual([(m['player'], m['x'], m['y']) for m in games[0]['moves']][:2],
+                         [('alice', 0, 0), ('bob', 1, 0)])
+
+    def test_filters_and_permissions(self):
+        self.assertEqual(len(self.read_export('?user=bob')), 1)
+        self.assertEqual(len(self.read_export('?since=2000-01-01&until=2000-01-02')), 0)
+        self.assertEqual(self.client1.get('/api/games/export/?since=yesterday').status_code, 400)
+        self.assertEqual(self.client2.get('/api/games/export/').status_code, 403)
+
+    def test_command_matches_endpoint(self):
+        out = StringIO()
+        call_command('export_games', '--user', 'alice', '--chunk-size', '1', stdout=out)
+        self.assertEqual([json.loads(line) for line in out.getvalue().splitlines()], self.read_export())
+
+    async def test_streams_asynchronously_under_asgi(self):
+        response = await AsyncClient().get(
+            '/api/games/export/', headers={'Authorization': f'Bearer {AccessToken.for_user(self.player1)}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line) for line in content.splitlines()],
+                         await sync_to_async(self.read_export)())
+
+
+class ImportTests(GameApiTestCase):
+    def write_ndjson(self, records):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False)
+        with handle:
+            for record in records:
+                handle.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def import_games(self, records, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_games', self.write_ndjson(records), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_round_trip_through_export(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        out = StringIO()
+        call_command('export_games', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        out, _ = self.import_games(records, '--batch-size', '1')
+        self.assertIn('run recompute_ratings', out)
+        original, imported = Game.objects.order_by('id')
+        self.assertEqual((imported.board, imported.status, imported.winner_id, imported.created_at, imported.updated_at),
+                         (original.board, original.status, original.winner_id, original.created_at, original.updated_at))
+        self.assertEqual([move.created_at for move in imported.moves.order_by('id')],
+                         [move.created_at for move in original.moves.order_by('id')])
+        self.assertTrue(Game._meta.get_field('created_at').auto_now_add)
+        profile = UserProfile.objects.get(user=self.player1)
+        self.assertEqual((profile.games_played, profile.games_won), (2, 2))
+
+    def test_invalid_records_are_skipped(self):
+        moves = [{'x': 0, 'y': 0}, {'x': 0, 'y': 0}]
+        out, err = self.import_games([
+            {'player1': 'alice', 'player2': 'bob', 'moves': moves},
+            {'player1': 'alice', 'player2': 'bob', 'moves': [{'x': 1, 'y': 1}], 'status': 'completed'},
+            {'player1': 'alice', 'player2': 'zoe', 'moves': []},
+            'not json',
+            {'player1': 'alice', 'player2': 'bob', 'moves': [{'x': 1, 'y': 1}]},
+        ])
+        self.assertIn('Imported 1 games, skipped 4', out)
+        self.assertIn('line 1: move 2 is on an occupied cell', err)
+        self.assertIn('line 3: unknown users: zoe', err)
+        game = Game.objects.get()
+        self.assertEqual((game.status, game.current_turn_id), ('ongoing', self.player2.id))
+
+    def test_create_users(self):
+        self.import_games([{'player1': 'zoe', 'player2': 'yan', 'moves': [
+            {'x': 0, 'y': 0}, {'x': 1, 'y': 1}, {'x': 0, 'y': 1}, {'x': 2, 'y': 2}, {'x': 0, 'y': 2}]}],
+            '--create-users')
+        zoe = User.objects.get(username='zoe')
+        self.assertFalse(zoe.has_usable_password())
+        self.assertEqual((zoe.profile.games_won, User.objects.get(username='yan').profile.games_lost), (1, 1))
+
+
+@override_settings(GAME_MOVE_STORAGE='log')
+class MoveLogTests(GameApiTestCase):
+    def test_packing(self):
+        self.assertEqual(pack_cells([0, 4, 8], 9), bytes([0, 4, 8]))
+        self.assertEqual(unpack_cells(pack_cells([0, 300, 360], 361), 361), [0, 300, 360])
+
+    def test_moves_served_from_log(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 1), (2, 2)])
+        self.assertFalse(Move.objects.exists())
+        self.assertEqual(bytes(Game.objects.get(pk=game_id).move_log), bytes([0, 4, 8]))
+
+        with self.assertNumQueries(1):
+            response = self.client1.get(f'/api/games/{game_id}/?expand=moves')
+        moves = response.data['moves']
+        self.assertEqual([(m['id'], m['player']['username'], m['position_x'], m['position_y']) for m in moves],
+                         [(1, 'alice', 0, 0), (2, 'bob', 1, 1), (3, 'alice', 2, 2)])
+
+        response = self.client1.get(f'/api/games/{game_id}/moves/?page_size=2')
+        self.assertEqual([m['id'] for m in response.data['results']], [1, 2])
+        response = self.client1.get(response.data['next'])
+        self.assertEqual([m['id'] for m in response.data['results']], [3])
+
+        response = self.client2.get(f'/api/games/{game_id}/wait/?after_move=2&timeout=0')
+        self.assertEqual([m['position_x'] for m in response.json()['moves']], [2])
+
+    def test_export_reads_log(self):
+        self.player1.is_staff = True
+        self.player1.save()
+        game_id = self.create_game(size=19, win_length=5)
+        self.play(game_id, [(18, 18), (0, 0)])
+        line = b''.join(self.client1.get('/api/games/export/').streaming_content)
+        self.assertEqual([(m['player'], m['x'], m['y']) for m in json.loads(line)['moves']],
+                         [('alice', 18, 18), ('bob', 0, 0)])
+
+
+class BoardFieldTests(GameApiTestCase):
+    def test_board_is_stored_encoded(self):
+        game_id = self.create_game()
+        self.play(game_id, [(0, 0), (1, 1)])
+        stored = Game.objects.filter(pk=game_id).values_list('board', flat=True).get()
+        self.assertEqual(stored, 'X...O....')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT board FROM game_game WHERE id = %s', [game_id])
+            self.assertEqual(cursor.fetchone(), ('X...O....',))
+        self.assertEqual(stored.to_lists(), [['X', None, None], [None, 'O', None], [None, None, None]])
+
+    def test_symmetries(self):
+        self.assertEqual(Board('X........').symmetries(), ['........X', '......X..', '..X......', 'X........'])
+        self.assertEqual(Board('....X....').symmetries(), ['....X....'])
+        with self.assertRaises(ValueError):
+            Board.parse('X.O.')
+
+    def test_position_search(self):
+        first, second, other = self.create_game(), self.create_game(), self.create_game()
+        self.play(first, [(0, 0), (1, 1)])
+        self.play(second, [(2, 2), (1, 1)])
+        self.play(other, [(0, 1), (1, 1)])
+
+        response = self.client1.get('/api/games/positions/?board=X...O....')
+        self.assertEqual([game['id'] for game in response.data['results']], [first])
+        response = self.client1.get('/api/games/positions/?board=X...O....&symmetric=1')
+        self.assertEqual([game['id'] for game in response.data['results']], [second, first])
+        self.assertEqual(self.client1.get('/api/games/positions/?board=XO').status_code, 400)
+
+
+class ArchiveTests(GameApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = self.create_game()
+        self.play(self.old, [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        Game.objects.filter(pk=self.old).update(updated_at=timezone.now() - timedelta(days=40))
+        self.recent = self.create_game()
+        self.play(self.recent, [(0, 0), (0, 1), (0, 2), (1, 1), (1, 0), (1, 2), (2, 1), (2, 0), (2, 2)])
+        self.ongoing = self.create_game()
+        self.ratings = dict(UserProfile.objects.values_list('user_id', 'rating'))
+        call_command('archive_games', stdout=StringIO())
+
+    def test_moves_old_completed_games_only(self):
+        self.assertEqual(list(ArchivedGame.objects.values_list('id', flat=True)), [self.old])
+        self.assertEqual(set(Game.objects.values_list('id', flat=True)), {self.recent, self.ongoing})
+        self.assertFalse(Move.objects.filter(game_id=self.old).exists())
+
+    def test_history_reads_both_tables(self):
+        response = self.client1.get('/api/match-history/')
+        self.assertEqual([(game['id'], game['result']) for game in response.data['results']],
+                         [(self.ongoing, 'ongoing'), (self.recent, 'draw'), (self.old, 'won')])
+        response = self.client1.get('/api/games/?page_size=2')
+        self.assertEqual([game['id'] for game in response.data['results']], [self.ongoing, self.recent])
+        response = self.client1.get(response.data['next'])
+        self.assertEqual([game['id'] for game in response.data['results']], [self.old])
+        response = self.client1.get('/api/games/?status=ongoing')
+        self.assertEqual([game['id'] for game in response.data['results']], [self.ongoing])
+
+        response = self.client1.get(f'/api/games/{self.old}/?expand=moves')
+        self.assertEqual((response.data['status'], response.data['winner']['id']), ('completed', self.player1.id))
+        self.assertEqual([(move['position_x'], move['position_y']) for move in response.data['moves']],
+                         [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        response = self.client1.get(f'/api/games/{self.old}/moves/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_recompute_ratings_includes_archive(self):
+        UserProfile.objects.update(rating=1000)
+        call_command('recompute_ratings', stdout=StringIO())
+        self.assertEqual(dict(UserProfile.objects.values_list('user_id', 'rating')), self.ratings)
+
+    def test_export_includes_archive(self):
+        out = StringIO()
+        call_command('export_games', stdout=out)
+        games = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([game['id'] for game in games], [self.old, self.recent, self.ongoing])
+        self.assertEqual(len(games[0]['moves']), 5)
+
+    def test_ongoing_listing_uses_partial_index(self):
+        queryset = Game.objects.filter(status='ongoing').order_by('-created_at', '-id')[:20]
+        self.assertIn('game_ongoing_idx', queryset.explain())
+
+
+class ConcurrentStatsTests(TransactionTestCase):
+    THREADS = 8
+    GAMES_PER_THREAD = 25
+
+    def test_no_lost_updates(self):
+        player1 = User.objects.create_user('alice')
+        player2 = User.objects.create_user('bob')
+        wins = Game(player1=player1, player2=player2, current_turn=player1, status='completed', winner=player1)
+        draws = Game(player1=player1, player2=player2, current_turn=player1, status='completed')
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def finish_games(worker):
+            try:
+                barrier.wait()
+                for i in range(self.GAMES_PER_THREAD):
+                    with transaction.atomic():
+                        UserProfile.record_game_result(draws if (worker + i) % 2 else wins)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=finish_games, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.GAMES_PER_THREAD
+        alice, bob = UserProfile.objects.get(user=player1), UserProfile.objects.get(user=player2)
+        self.assertEqual((alice.games_played, bob.games_played), (total, total))
+        self.assertEqual((alice.games_won, alice.games_drawn, alice.games_lost), (total // 2, total // 2, 0))
+        self.assertEqual((bob.games_lost, bob.games_drawn, bob.games_won), (total // 2, total // 2, 0))
+
+
+def race_move(user_id, game_id, x, y, barrier, results):
+    """Child process: wait for the others, then try the move."""
+    connections.close_all()
+    client = APIClient()
+    client.force_authenticate(User.objects.get(pk=user_id))
+    barrier.wait()
+    response = client.post(f'/api/games/{game_id}/make_move/', {'position_x': x, 'position_y': y}, format='json')
+    results.put(response.status_code)
+    connections.close_all()
+
+
+class ConcurrentMoveTests(TransactionTestCase):
+    PROCESSES = 5
+
+    def test_racing_moves_from_several_processes(self):
+        players = [User.objects.create_user('alice'), User.objects.create_user('bob')]
+        game = Game.objects.create(player1=players[0], player2=players[1], current_turn=players[0],
+                                   size=5, win_length=5)
+        context = multiprocessing.get_context('fork')
+        accepted = 0
+        for turn in range(6):
+            # Every process plays a different free cell for the player whose turn it is
+            free = [index for index in range(25) if game.board.encoded[index] == EMPTY_CELL]
+            barrier = context.Barrier(self.PROCESSES)
+            results = context.Queue()
+            connections.close_all()
+            processes = [
+                context.Process(target=race_move, args=(
+                    players[turn % 2].id, game.id, free[n] // 5, free[n] % 5, barrier, results))
+                for n in range(self.PROCESSES)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join(30)
+            codes = sorted(results.get(timeout=5) for _ in processes)
+            # One move wins; the rest either lose the version race or see it is no longer their turn
+            self.assertEqual(codes.count(200), 1, codes)
+            self.assertTrue(set(codes) <= {200, 400, 409}, codes)
+            accepted += 1
+            game.refresh_from_db()
+
+        moves = list(game.moves.order_by('id'))
+        self.assertEqual(len(moves), accepted)
+        self.assertEqual(game.version, accepted)
+        board = [[None] * 5 for _ in range(5)]
+        for turn, move in enumerate(moves):
+            self.assertEqual(move.player, players[turn % 2])
+            board[move.position_x][move.position_y] = 'XO'[turn % 2]
+        self.assertEqual(game.board, board)
+
+
+class GameWebSocketTests(TransactionTestCase):
+    def setUp(self):
+        self.player1 = User.objects.create_user('alice')
+        self.player2 = User.objects.create_user('bob')
+        self.outsider = User.objects.create_user('carol')
+        self.game = Game.objects.create(player1=self.player1, player2=self.player2, current_turn=self.player1)
+
+    def connect(self, user, game_id=None):
+        token = AccessToken.for_user(user)
+        return WebsocketCommunicator(application, f'/ws/games/{game_id or self.game.id}/?token={token}')
+
+    def move(self, user, x, y):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(f'/api/games/{self.game.id}/make_move/',
+                           {'position_x': x, 'position_y': y}, format='json')
+
+    async def test_two_clients_receive_full_game(self):
+        sockets = [self.connect(self.player1), self.connect(self.player2)]
+        for socket in sockets:
+            connected, _ = await socket.connect()
+            self.assertTrue(connected)
+
+        players = (self.player1, self.player2)
+        moves = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+        for turn, (x, y) in enumerate(moves):
+            response = await sync_to_async(self.move)(players[turn % 2], x, y)
+            self.assertEqual(response.status_code, 200)
+            for socket in sockets:
+                event = await socket.receive_json_from(timeout=2)
+                self.assertEqual(event['move'], {'player': players[turn % 2].id, 'position_x': x, 'position_y': y})
+                self.assertEqual(event['game']['version'], turn + 1)
+
+        self.assertEqual(event['type'], 'game.completed')
+        self.assertEqual(event['game']['winner'], self.player1.id)
+        for socket in sockets:
+            self.assertTrue(await socket.receive_nothing())
+            await socket.disconnect()
+
+    async def test_rejects_missing_token_and_outsiders(self):
+        socket = WebsocketCommunicator(application, f'/ws/games/{self.game.id}/')
+        connected, code = await socket.connect()
+        self.assertEqual((connected, code), (False, 4401))
+
+        socket = self.connect(self.outsider)
+        connected, code = await socket.connect()
+        self.assertEqual((connected, code), (False, 4403))
+
+
+@override_settings(GAME_WAIT_POLL_INTERVAL=30)
+class AsyncLongPollTests(TransactionTestCase):
+    """wait under the ASGI handler, where every sync view shares one thread."""
+
+    def setUp(self):
+        user_cache.clear()
+        bucket_store().reset()
+        self.player1 = User.objects.create_user('alice')
+        self.player2 = User.objects.create_user('bob')
+        self.game = Game.objects.create(player1=self.player1, player2=self.player2, current_turn=self.player1)
+
+    def headers(self, user):
+        return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    async def test_concurrent_move_wakes_waiter(self):
+        client = AsyncClient()
+        start = time.monotonic()
+        waiter = asyncio.ensure_future(
+            client.get(f'/api/games/{self.game.id}/wait/?timeout=5', headers=self.headers(self.player2)))
+        await asyncio.sleep(0.3)
+        response = await asyncio.wait_for(client.post(
+            f'/api/games/{self.game.id}/make_move/', {'position_x': 1, 'position_y': 1},
+            content_type='application/json', headers=self.headers(self.player1)), 2)
+        self.assertEqual(response.status_code, 200)
+        response = await asyncio.wait_for(waiter, 2)
+        # Woken by the move, not by the 5s timeout or the 30s poll
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([(m['position_x'], m['position_y']) for m in response.json()['moves']], [(1, 1)])
@@ -0,0 +1,193 @@
+"""
+Token-bucket throttling.
+
+Each (scope, user) or (scope, IP) key has a bucket holding up to N tokens
+for a rate of 'N/period' in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+refilled continuously at N per period. A request takes one token or is
+rejected with 429 and a Retry-After of the time until the next token. So a
+client may burst N requests, then keeps the average rate. A view opts in
+with throttle_classes and a throttle_scope; scopes without a rate are not
+throttled.
+
+Buckets live in the store named by THROTTLE_STORE:
+
+- 'memory': a dict in each worker process. Each bucket is an immutable
+  tuple replaced by one dict assignment, so there is no lock; two threads
+  racing on the same key can at worst let one extra request through.
+  Buckets idle long enough to be full again are indistinguishable from no
+  bucket and are swept out every THROTTLE_EVICT_INTERVAL seconds.
+- 'sqlite': a table in the SQLite file THROTTLE_SQLITE_PATH, shared by all
+  workers on the host, updated in a short BEGIN IMMEDIATE transaction.
+"""
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
+
+
+def refill(bucket, capacity, per_second, now):
+    """Tokens in bucket (tokens, updated_at) at now; a missing bucket is full."""
+    if bucket is None:
+        return float(capacity)
+    return min(float(capacity), bucket[0] + (now - bucket[1]) * per_second)
+
+
+class MemoryBucketStore:
+    """Buckets in a dict of key -> (tokens, updated_at, full_at), see the module docstring."""
+    timer = time.monotonic
+
+    def __init__(self, evict_interval=None):
+        self._buckets = {}
+        self._evict_interval = evict_interval
+        self._next_sweep = 0
+
+    @property
+    def evict_interval(self):
+        return self._evict_interval if self._evict_interval is not None else settings.THROTTLE_EVICT_INTERVAL
+
+    def take(self, key, capacity, per_second):
+        """Take a token from key's bucket. Returns 0 if one was there, else the seconds until one is."""
+        now = self.timer()
+        tokens = refill(self._buckets.get(key), capacity, per_second, now)
+        wait = 0 if tokens >= 1 else (1 - tokens) / per_second
+        if not wait:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / per_second)
+        if now >= self._next_sweep:
+            self.evict(now)
+        return wait
+
+    def evict(self, now=None):
+        """Drop every bucket that has refilled completely."""
+        now = self.timer() if now is None else now
+        self._next_sweep = now + self.evict_interval
+        for key, bucket in list(self._buckets.items()):
+            if bucket[2] <= now:
+                self._buckets.pop(key, None)
+
+    def reset(self):
+        self._buckets.clear()
+        self._next_sweep = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Buckets in a local SQLite file shared by every worker, one connection per thread."""
+    timer = time.time  # Wall clock: the monotonic clock is per process
+
+    def __init__(self, path, evict_interval=None):
+        self.path = str(path)
+        self._local = threading.local()
+        self._evict_interval = evict_interval
+        self._next_sweep = 0
+
+    @property
+    def evict_interval(self):
+        return self._evict_interval if self._evict_interval is not None else settings.THROTTLE_EVICT_INTERVAL
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Buckets are disposable: losing the last writes on a crash only resets some limits
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_bucket ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, capacity, per_second):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            now = self.timer()
+            bucket = connection.execute(
+                'SELECT tokens, updated_at FROM throttle_bucket WHERE key = ?', (key,)).fetchone()
+            tokens = refill(bucket, capacity, per_second, now)
+            wait = 0 if tokens >= 1 else (1 - tokens) / per_second
+            if not wait:
+                tokens -= 1
+            connection.execute(
+                'INSERT OR REPLACE INTO throttle_bucket (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, now + (capacity - tokens) / per_second))
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.evict_interval
+                connection.execute('DELETE FROM throttle_bucket WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+    def evict(self, now=None):
+        now = self.timer() if now is None else now
+        self._next_sweep = now + self.evict_interval
+        self._connection().execute('DELETE FROM throttle_bucket WHERE full_at <= ?', (now,))
+
+    def reset(self):
+        self._connection().execute('DELETE FROM throttle_bucket')
+        self._next_sweep = 0
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM throttle_bucket').fetchone()[0]
+
+
+_stores = {}
+
+
+def bucket_store():
+    """The store THROTTLE_STORE names, created once per process."""
+    name = settings.THROTTLE_STORE
+    key = (name, str(settings.THROTTLE_SQLITE_PATH)) if name == 'sqlite' else name
+    store = _stores.get(key)
+    if store is None:
+        if name == 'memory':
+            store = MemoryBucketStore()
+        elif name == 'sqlite':
+            store = SQLiteBucketStore(settings.THROTTLE_SQLITE_PATH)
+        else:
+            raise ValueError(f"THROTTLE_STORE must be 'memory' or 'sqlite', not {name!r}")
+        store = _stores.setdefault(key, store)
+    return store
+
+
+class BucketThrottle(ScopedRateThrottle):
+    """
+    Token bucket per authenticated user (per IP for anonymous requests)
+    for the view's throttle_scope.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        # Read on every request, so rates follow settings changes
+        self.rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope) if self.scope else None
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        self.wait_time = bucket_store().take(self.key, self.num_requests, self.num_requests / self.duration)
+        return not self.wait_time
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'{self.scope}:user:{request.user.pk}'
+        return f'{self.scope}:ip:{self.get_ident(request)}'
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPBucketThrottle(BucketThrottle):
+    """Token bucket per client IP, for endpoints used before logging in."""
+
+    def get_cache_key(self, request, view):
+        return f'{self.scope}:ip:{self.get_ident(request)}'
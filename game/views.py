@@ -1,20 +1,96 @@
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, generics, status
+from django.views import View
+from rest_framework import exceptions, viewsets, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
-from django.db.models import Q
-from .models import Game, Move, UserProfile
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from . import matchmaking
+from .archive import archived_games, history_branches
+from .models import Game, MatchmakingEntry, Move, UserProfile, make_game_etag
+from .permissions import IsGameParticipant
+from .ai import choose_move, is_bot
+from .engine import MAX_SIZE, MIN_SIZE, SIZE, Position, get_rules, side_to_move
+from .events import move_notifier, publish_game_event
+from .exceptions import GameConflict
+from .fields import Board
+from .export import aiter_ndjson, export_querysets, iter_ndjson
+from .leaderboard import leaderboard
+from .movelog import LoggedMove, cell_width, pack_cells, pack_times, uses_move_log
+from .pagination import KeysetPagination, MoveKeysetPagination
+from .tablebase import board_masks, describe, tablebase
+from .throttling import BucketThrottle, IPBucketThrottle
 from .serializers import (
-    GameSerializer, UserSerializer, GameHistorySerializer,
-    UserProfileSerializer, UserRegistrationSerializer
+    GameSerializer, GameStateSerializer, MoveSerializer, UserSerializer, GameHistorySerializer,
+    LeaderboardEntrySerializer, UserProfileSerializer, UserRegistrationSerializer, representation_shape,
+    split_param
 )
 
+def play_move(game, player, position, index):
+    """
+    Place player's stone on cell index of game, whose current state is
+    position, and record the move. Returns the new position.
+    """
+    is_player1 = game.player1_id == player.id
+    symbol = 'X' if is_player1 else 'O'
+    position = position.play(index, symbol)
+    changes = {'board': Board(position.to_string())}
+
+    # Only the lines through the new stone can have been completed
+    if position.is_winning_move(index, symbol):
+        changes.update(status='completed', winner=player)
+    elif position.is_full():
+        changes['status'] = 'completed'
+    else:
+        changes['current_turn'] = game.player2 if is_player1 else game.player1
+
+    # The packed log is written by the same UPDATE as the board
+    now = timezone.now()
+    number = len(game.move_log) // cell_width(game.rules.cells) + 1
+    changes['move_log'] = bytes(game.move_log) + pack_cells([index], game.rules.cells)
+    changes['move_times'] = bytes(game.move_times) + pack_times([now])
+
+    x, y = game.rules.cell_coords(index)
+    with transaction.atomic():
+        # Conditional on the version we validated against, so a racing
+        # move fails cleanly instead of overwriting this one
+        if not game.save_if_current(**changes):
+            raise GameConflict()
+        # Record the move
+        if uses_move_log():
+            move = LoggedMove(number, game, player, x, y, now)
+        else:
+            move = Move.objects.create(game=game, player=player, position_x=x, position_y=y)
+        if game.status == 'completed':
+            # Update both player profiles and ratings in one statement
+            rating_changes = UserProfile.record_game_result(game)
+            transaction.on_commit(lambda: leaderboard.record_changes(rating_changes))
+    transaction.on_commit(lambda: publish_game_event(game, move))
+    return position
+
 class UserRegistrationView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = []
+    throttle_classes = [IPBucketThrottle]
+    throttle_scope = 'register'
+
+class TokenView(TokenObtainPairView):
+    """Login; throttled per IP since every attempt runs the password hasher."""
+    throttle_classes = [IPBucketThrottle]
+    throttle_scope = 'token'
 
 class UserListView(generics.ListAPIView):
     queryset = User.objects.all()
@@ -35,7 +111,12 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get', 'put', 'patch'])
     def me(self, request):
         if request.method == 'GET':
-            profile, created = UserProfile.objects.get_or_create(user=request.user)
+            try:
+                # One query, which also links the profile back to request.user
+                profile = request.user.profile
+            except UserProfile.DoesNotExist:
+                # Users bulk-created without the post_save signal have none yet
+                profile, created = UserProfile.objects.get_or_create(user=request.user)
             serializer = UserProfileSerializer(profile)
             return Response(serializer.data)
         
@@ -49,12 +130,58 @@ class GameViewSet(viewsets.ModelViewSet):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    throttle_scope = None  # Set per action, see make_move
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsGameParticipant()]
+        if self.action == 'export':
+            return [IsAdminUser()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        queryset = Game.objects.select_related('player1', 'player2', 'current_turn', 'winner')
+        if self.action == 'list' and self.request.query_params.get('status'):
+            # status=ongoing is served by the partial game_ongoing_idx
+            queryset = queryset.filter(status=self.request.query_params['status'])
+        expand = split_param(self.request.query_params.get('expand'))
+        if self.action in ['list', 'retrieve', 'update', 'partial_update'] and 'moves' in expand \
+                and not uses_move_log():
+            # GameSerializer nests every move with its player
+            queryset = queryset.prefetch_related(
+                Prefetch('moves', queryset=Move.objects.select_related('player'))
+            )
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        # Listings include archived games unless only ongoing ones are asked for
+        if self.action == 'list' and self.request.query_params.get('status') in (None, 'completed'):
+            return self.paginator.paginate_branches([queryset, archived_games()], self.request, view=self)
+        return super().paginate_queryset(queryset)
+
+    def get_game_or_archived(self):
+        """The game, or for a read of a game that has been archived, its ArchivedGame."""
+        try:
+            return self.get_object()
+        except Http404:
+            return get_object_or_404(archived_games(), pk=self.kwargs['pk'])
+
+    def retrieve(self, request, *args, **kwargs):
+        # Answer conditional GETs from the version column alone, without
+        # loading the players and moves or serializing anything
+        # The ETag covers ?fields and ?expand, which change the body of one version
+        shape = representation_shape(request)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and str(kwargs['pk']).isdigit():
+            version = Game.objects.filter(pk=kwargs['pk']).values_list('version', flat=True).first()
+            if version is not None and if_none_match == make_game_etag(kwargs['pk'], version, shape):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': if_none_match})
+
+        game = self.get_game_or_archived()
+        serializer = self.get_serializer(game)
+        return Response(serializer.data, headers={'ETag': make_game_etag(game.pk, game.version, shape)})
+
     def create(self, request):
         player2_id = request.data.get('player2_id')
         if not player2_id:
@@ -70,79 +197,97 @@ class GameViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            size = int(request.data.get('size', 3))
+            win_length = int(request.data.get('win_length', min(size, 5)))
+            rules = get_rules(size, win_length)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': f'size must be {MIN_SIZE}-{MAX_SIZE} and win_length {MIN_SIZE}-size'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         game = Game.objects.create(
             player1=request.user,
             player2=player2,
             current_turn=request.user,
-            board=[[None, None, None] for _ in range(3)]
+            size=rules.size,
+            win_length=rules.win_length,
+            board=Position(rules=rules).to_string()
         )
 
         serializer = self.get_serializer(game)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[BucketThrottle], throttle_scope='make_move')
     def make_move(self, request, pk=None):
         game = self.get_object()
         if game.status != 'ongoing':
             return Response({'error': 'Game is already finished'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if game.current_turn != request.user:
+        if game.current_turn_id != request.user.id:
             return Response({'error': 'Not your turn'}, status=status.HTTP_400_BAD_REQUEST)
 
         x = request.data.get('position_x')
         y = request.data.get('position_y')
 
-        if not (0 <= x < 3 and 0 <= y < 3):
+        rules = game.rules
+        if not rules.in_bounds(x, y):
             return Response({'error': 'Invalid position'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if game.board[x][y] is not None:
+        position = game.board.position(rules)
+        index = rules.cell_index(x, y)
+        if not position.is_empty(index):
             return Response({'error': 'Position already taken'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Make the move
-        symbol = 'X' if request.user == game.player1 else 'O'
-        game.board[x][y] = symbol
-        
-        # Record the move
-        Move.objects.create(game=game, player=request.user, position_x=x, position_y=y)
-
-        # Check for winner
-        def check_winner():
-            # Check rows
-            for i in range(3):
-                if game.board[i][0] == game.board[i][1] == game.board[i][2] and game.board[i][0] is not None:
-                    return True
-            # Check columns
-            for i in range(3):
-                if game.board[0][i] == game.board[1][i] == game.board[2][i] and game.board[0][i] is not None:
-                    return True
-            # Check diagonals
-            if game.board[0][0] == game.board[1][1] == game.board[2][2] and game.board[0][0] is not None:
-                return True
-            if game.board[0][2] == game.board[1][1] == game.board[2][0] and game.board[0][2] is not None:
-                return True
-            return False
-
-        def is_board_full():
-            return all(cell is not None for row in game.board for cell in row)
-
-        if check_winner():
-            game.status = 'completed'
-            game.winner = request.user
-            # Update player profiles
-            request.user.profile.update_game_stats('won')
-            other_player = game.player2 if request.user == game.player1 else game.player1
-            other_player.profile.update_game_stats('lost')
-        elif is_board_full():
-            game.status = 'completed'
-            # Update player profiles for draw
-            if game.status == 'completed' and not game.winner:
-                game.player1.profile.update_game_stats('draw')
-                game.player2.profile.update_game_stats('draw')
+        position = play_move(game, request.user, position, index)
+        if game.status == 'ongoing' and is_bot(game.current_turn):
+            # Answer in the same request, so the response already holds the reply
+            try:
+                play_move(game, game.current_turn, position, choose_move(position))
+            except GameConflict:
+                # The player's move is committed either way; report the state that won
+                game.refresh_from_db()
+        return Response(GameStateSerializer(game).data, headers={'ETag': game.etag})
+
+    @action(detail=True, methods=['get'])
+    def moves(self, request, pk=None):
+        """The game's moves in play order, paginated with cursors."""
+        game = self.get_game_or_archived()
+        paginator = MoveKeysetPagination()
+        if uses_move_log() or not isinstance(game, Game):
+            page = paginator.paginate_sequence(game.move_history(), request, view=self)
         else:
-            game.current_turn = game.player2 if request.user == game.player1 else game.player1
+            page = paginator.paginate_queryset(game.moves.select_related('player'), request, view=self)
+        return paginator.get_paginated_response(MoveSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def analysis(self, request, pk=None):
+        """
+        Perfect-play value of the current position and the score of every
+        legal move, from the 3x3 tablebase. Only the board is read, without
+        building the game or its players.
+        """
+        board, size = generics.get_object_or_404(Game.objects.values_list('board', 'size'), pk=pk)
+        if size != SIZE:
+            return Response({'error': 'Analysis is only available for 3x3 games'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        x, o = board_masks(board.encoded)
+        score = tablebase.score(x, o)
+        if score is None:
+            return Response({'error': 'Position cannot occur in a game'}, status=status.HTTP_400_BAD_REQUEST)
 
-        game.save()
-        return Response(GameSerializer(game).data)
+        moves = sorted(tablebase.move_scores(x, o), key=lambda item: -item[1])
+        return Response({
+            'to_move': side_to_move(x, o) if moves else None,
+            'value': describe(score),
+            'score': score,
+            'moves': [
+                {'position_x': index // SIZE, 'position_y': index % SIZE,
+                 'value': describe(move_score), 'score': move_score}
+                for index, move_score in moves
+            ],
+        })
 
     @action(detail=False, methods=['get'])
     def my_games(self, request):
@@ -152,9 +297,46 @@ class GameViewSet(viewsets.ModelViewSet):
         - Game result (win/loss/draw)
         - Timeline of moves made during the match
         """
-        games = Game.objects.filter(Q(player1=request.user) | Q(player2=request.user))
-        serializer = GameHistorySerializer(games, many=True, context={'request': request})
-        return Response(serializer.data)
+        page = self.paginator.paginate_branches(history_branches(request.user), request, view=self)
+        serializer = GameHistorySerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def positions(self, request):
+        """
+        Games whose board is currently the given one, newest first, found
+        through the board index. board is the encoded board, row by row
+        ('X', 'O' or '.' per cell); with symmetric=1 rotations and
+        reflections of it match too.
+        """
+        try:
+            board = Board.parse(request.query_params.get('board', ''))
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('symmetric') in ('1', 'true'):
+            games = self.get_queryset().filter(board__in=board.symmetries())
+        else:
+            games = self.get_queryset().filter(board=board)
+        page = self.paginate_queryset(games)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every game with its moves as NDJSON, staff only. Filters:
+        since and until (ISO dates or datetimes, until exclusive) and user
+        (a username).
+        """
+        params = request.query_params
+        try:
+            games = export_querysets(params.get('since'), params.get('until'), params.get('user'))
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        # An ASGI server needs an async iterator to stream; it would buffer a sync one whole
+        lines = aiter_ndjson(games) if isinstance(request._request, ASGIRequest) else iter_ndjson(games)
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="games.ndjson"'
+        return response
 
     def update(self, request, *args, **kwargs):
         game = self.get_object()
@@ -167,23 +349,164 @@ class GameViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         game = serializer.instance
-        if game.status == 'completed':
-            # Update player profiles when game is completed
-            winner = game.winner
-            if winner:
-                winner.profile.update_game_stats('won')
-                loser = game.player1 if winner == game.player2 else game.player2
-                loser.profile.update_game_stats('lost')
-            else:
-                game.player1.profile.update_game_stats('draw')
-                game.player2.profile.update_game_stats('draw')
-        serializer.save()
+        with transaction.atomic():
+            # Claim the next version first so a concurrent move can't be overwritten
+            if not game.save_if_current():
+                raise GameConflict()
+            if game.status == 'completed':
+                # Update player profiles when game is completed
+                rating_changes = UserProfile.record_game_result(game)
+                transaction.on_commit(lambda: leaderboard.record_changes(rating_changes))
+            serializer.save()
+
+def authenticated_user(request):
+    """The user REST_FRAMEWORK's authentication classes find on a plain Django request, or None."""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def wait_for_game(request, pk):
+    """The game GameWaitView waits on; raises AuthenticationFailed or Game.DoesNotExist."""
+    if authenticated_user(request) is None:
+        raise exceptions.NotAuthenticated()
+    return Game.objects.select_related('current_turn', 'winner').get(pk=pk)
+
+
+def moves_after(game, after_move):
+    if uses_move_log():
+        return game.move_history()[after_move:]
+    return list(game.moves.select_related('player').order_by('created_at', 'id')[after_move:])
+
+
+def wait_response_data(game, moves):
+    data = GameStateSerializer(game).data
+    data['moves'] = MoveSerializer(moves, many=True).data
+    return data
+
+
+class GameWaitView(View):
+    """
+    GET games/{id}/wait/: long-poll for moves after the first after_move
+    moves of the game.
+
+    Returns as soon as a newer move exists, the game is finished or the
+    timeout passes, with the game state and only the new moves. Waiting
+    is done on an in-process notification from make_move, re-checking
+    the database every GAME_WAIT_POLL_INTERVAL seconds to catch moves
+    handled by other workers. It is an async view: under ASGI every sync
+    view shares one thread, which a blocked waiter would hold, stalling
+    the very move that should wake it. Database work runs in sync_to_async
+    calls and nothing is held between them.
+    """
+
+    async def get(self, request, pk):
+        try:
+            game = await sync_to_async(wait_for_game)(request, pk)
+        except exceptions.APIException as error:
+            return JsonResponse({'detail': str(error.detail)}, status=error.status_code)
+        except Game.DoesNotExist:
+            return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            after_move = max(int(request.GET.get('after_move', 0)), 0)
+            timeout = float(request.GET.get('timeout', settings.GAME_WAIT_TIMEOUT))
+            if not math.isfinite(timeout):
+                # nan would slip through the clamp below
+                raise ValueError(timeout)
+        except ValueError:
+            return JsonResponse({'error': 'after_move and timeout must be numbers'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        timeout = min(max(timeout, 0), settings.GAME_WAIT_TIMEOUT)
+        deadline = time.monotonic() + timeout
+
+        with move_notifier.listen(game.pk) as listener:
+            while True:
+                moves = await sync_to_async(moves_after)(game, after_move)
+                remaining = deadline - time.monotonic()
+                if moves or game.status != 'ongoing' or remaining <= 0:
+                    break
+                await listener.wait(min(remaining, settings.GAME_WAIT_POLL_INTERVAL))
+                await sync_to_async(game.refresh_from_db)()
+
+        return JsonResponse(await sync_to_async(wait_response_data)(game, moves))
 
 class MatchHistoryView(generics.ListAPIView):
     serializer_class = GameHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Game.objects.filter(
             Q(player1=self.request.user) | Q(player2=self.request.user)
-        ).order_by('-created_at')
+        ).select_related('player1', 'player2', 'winner').order_by('-created_at', '-id')
+
+    def paginate_queryset(self, queryset):
+        return self.paginator.paginate_branches(history_branches(self.request.user), self.request, view=self)
+
+class LeaderboardView(generics.GenericAPIView):
+    """
+    Top players and the requesting user's rank, served from the in-process
+    Leaderboard: a slice for the top-N and a binary search for "my rank".
+    """
+    serializer_class = LeaderboardEntrySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        top = leaderboard.top(limit)
+        profiles = UserProfile.objects.select_related('user').in_bulk(
+            [user_id for _, user_id, _ in top], field_name='user_id')
+        ranks = {user_id: rank for rank, user_id, _ in top}
+        results = [profiles[user_id] for _, user_id, _ in top if user_id in profiles]
+
+        me = None
+        profile = UserProfile.objects.filter(user=request.user).select_related('user').first()
+        if profile is not None:
+            score = getattr(profile, UserProfile.RANKING_FIELD)
+            me = self.get_serializer(profile, context={'ranks': {profile.user_id: leaderboard.rank_of_score(score)}}).data
+        return Response({
+            'results': self.get_serializer(results, many=True, context={'ranks': ranks}).data,
+            'me': me,
+        })
+
+class MatchmakingView(generics.GenericAPIView):
+    """
+    Rating-based matchmaking. POST joins the queue and is paired straight
+    away when someone close enough is waiting; otherwise the player polls
+    GET until another player's join pairs them. DELETE leaves the queue.
+    """
+    serializer_class = GameSerializer
+    permission_classes = [IsAuthenticated]
+
+    def matched(self, game, status_code=status.HTTP_200_OK):
+        return Response({'status': 'matched', 'game': self.get_serializer(game).data}, status=status_code)
+
+    def waiting(self, entry):
+        return Response({'status': 'waiting', 'rating': entry.rating, 'since': entry.created_at},
+                        status=status.HTTP_202_ACCEPTED)
+
+    def post(self, request):
+        entry, game = matchmaking.join(request.user)
+        if game is not None:
+            return self.matched(game, status.HTTP_201_CREATED)
+        return self.waiting(entry)
+
+    def get(self, request):
+        entry = MatchmakingEntry.objects.filter(user=request.user).first()
+        if entry is None:
+            return Response({'error': 'Not in queue'}, status=status.HTTP_404_NOT_FOUND)
+        game = matchmaking.check(entry)
+        if game is not None:
+            return self.matched(game)
+        return self.waiting(entry)
+
+    def delete(self, request):
+        if not matchmaking.leave(request.user):
+            return Response({'error': 'Not in queue'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -87,6 +87,8 @@ class TicTacToe:
         self.player1_name = player1_name
         self.player2_name = player2_name
         self.game_id = None
+        self.version = None
+        self.etag = None
         
         # Create game in database
         if not self.create_game():
@@ -121,7 +123,9 @@ class TicTacToe:
         )
         
         if response.ok:
-            self.game_id = response.json()['id']
+            game_state = response.json()
+            self.game_id = game_state['id']
+            self.version = game_state['version']
             print(f"{Fore.GREEN}Game created with ID: {self.game_id}{Style.RESET_ALL}")
             return True
         else:
@@ -171,18 +175,15 @@ class TicTacToe:
         )
         
         if not response.ok:
+            # Our copy may be stale (e.g. 409 after a concurrent change): re-sync before retrying
+            self.refresh()
             return False, response.json().get('error', 'Invalid move')
-            
-        # Get updated game state
-        response = requests.get(f"{BASE_URL}/games/{self.game_id}/", headers=headers)
-        if not response.ok:
-            return False, "Failed to get game state"
-            
+
+        # The move response already carries the authoritative game state
         game_state = response.json()
-        
-        # Update local board from game state
-        self.board = game_state['board']
-        
+        self.etag = response.headers.get('ETag')
+        self.apply_state(game_state)
+
         # Check game status
         if game_state['status'] == 'completed':
             self.game_over = True
@@ -195,6 +196,25 @@ class TicTacToe:
         self.current_player = 'O' if self.current_player == 'X' else 'X'
         return True, "continue"
 
+    def apply_state(self, game_state):
+        """Update the local board from a game state returned by the API"""
+        self.board = [[cell or ' ' for cell in row] for row in game_state['board']]
+        self.version = game_state['version']
+
+    def refresh(self):
+        """Re-sync with the server; a 304 means nothing changed since our last state"""
+        headers = {'Authorization': f'Bearer {self.player1_token}'}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        response = requests.get(f"{BASE_URL}/games/{self.game_id}/", headers=headers)
+        if response.status_code == 304:
+            return True
+        if not response.ok:
+            return False
+        self.etag = response.headers.get('ETag')
+        self.apply_state(response.json())
+        return True
+
 def play_game():
     clear_screen()
     print(f"{Style.BRIGHT}Welcome to Tic-Tac-Toe!!!!{Style.RESET_ALL}")
@@ -228,6 +248,7 @@ def play_game():
         clear_screen()
         print(f"\nPlayer 1 ({Fore.BLUE}X{Style.RESET_ALL}): {player1_name}")
         print(f"Player 2 ({Fore.RED}O{Style.RESET_ALL}): {player2_name}")
+        # The board is kept current from each make_move response, no GET per turn
         game.print_board()
         
         current_player_name = player1_name if game.current_player == 'X' else player2_name
@@ -271,7 +292,7 @@ def play_game():
         headers = {'Authorization': f'Bearer {player1_token}'}
         response = requests.get(f"{BASE_URL}/match-history/", headers=headers)
         if response.ok:
-            history = response.json()
+            history = response.json()['results']
             print("\nMatch History:")
             print("="*50)
             for game in history:
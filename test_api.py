@@ -1,91 +1,279 @@
-import requests
-import time
+"""
+Load generator for the API.
+
+Registers --pairs pairs of fresh users, logs them in, then plays --games
+games end to end, --concurrency at a time, over one pooled HTTP client:
+player 1 creates the game, both players move at random until it is
+finished, then player 1 reads it back and lists their games. Reports
+p50/p95/p99 latency, throughput and error rate per endpoint, and writes
+them as JSON to --output so runs can be compared over time (--baseline
+prints the change against an earlier result file).
+
+Start the server first, e.g. with throttling off so that registering and
+logging in many users from one IP is not rate limited (only allowed with
+DEBUG on; never in production):
+    TICTACTOE_DISABLE_THROTTLING=1 daphne tictactoe.asgi:application
+    TICTACTOE_DISABLE_THROTTLING=1 python manage.py runserver
+
+Then, from the project root (needs httpx, see requirements-dev.txt):
+    python test_api.py [--pairs 10] [--games 100] [--concurrency 20]
+
+With --pairs 1 --games 1 it is the old smoke test of a single game.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import subprocess
 import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
 
 BASE_URL = 'http://localhost:8000/api'
+PASSWORD = 'loadtest-pass-123'
+# A move answered 429 is retried after its Retry-After, at most this often
+MOVE_RETRIES = 5
 
-def print_response(title, response):
-    print(f"\n=== {title} ===")
-    print(f"Status Code: {response.status_code}")
-    try:
-        print("Response:", response.json())
-    except:
-        print("Response:", response.text)
-    print("=" * (len(title) + 8))
-    return response.json() if response.ok else None
 
-def test_apis():
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def token_user_id(access):
+    """The user_id claim of a SimpleJWT access token; the client has no need to verify it."""
+    payload = access.split('.')[1]
+    return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['user_id']
+
+
+class Recorder:
+    """Latency and outcome of every request, by endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.failures = defaultdict(int)  # Timeouts and connection errors, no response
+
+    async def request(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[endpoint].append(time.perf_counter() - start)
+            self.failures[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            statuses = self.statuses[endpoint]
+            errors = self.failures[endpoint] + sum(n for code, n in statuses.items() if code >= 400)
+            endpoints[endpoint] = {
+                'requests': len(ordered),
+                'errors': errors,
+                'error_rate': errors / len(ordered),
+                'throttled': statuses.get(429, 0),
+                'failures': self.failures[endpoint],
+                'statuses': {str(code): n for code, n in sorted(statuses.items())},
+                'throughput': len(ordered) / elapsed,
+                'latency_ms': {
+                    'mean': sum(ordered) / len(ordered) * 1e3,
+                    'p50': percentile(ordered, 50) * 1e3,
+                    'p95': percentile(ordered, 95) * 1e3,
+                    'p99': percentile(ordered, 99) * 1e3,
+                    'max': ordered[-1] * 1e3,
+                },
+            }
+        return endpoints
+
+
+class Player:
+    def __init__(self, username):
+        self.username = username
+        self.id = None
+        self.headers = None
+
+
+async def sign_up(client, recorder, player):
+    """Register and log in player. Returns an error message or None."""
+    credentials = {'username': player.username, 'password': PASSWORD}
+    response = await recorder.request(client, 'register', 'POST', '/register/', json=credentials)
+    if response is None or response.status_code != 201:
+        return f'register {player.username}: {response.status_code if response else "no response"}'
+    response = await recorder.request(client, 'token', 'POST', '/token/', json=credentials)
+    if response is None or response.status_code != 200:
+        return f'token {player.username}: {response.status_code if response else "no response"}'
+    access = response.json()['access']
+    player.id = token_user_id(access)
+    player.headers = {'Authorization': f'Bearer {access}'}
+    return None
+
+
+async def make_move(client, recorder, game_id, player, x, y):
+    for _ in range(MOVE_RETRIES + 1):
+        response = await recorder.request(client, 'make_move', 'POST', f'/games/{game_id}/make_move/',
+                                          json={'position_x': x, 'position_y': y}, headers=player.headers)
+        if response is None or response.status_code != 429:
+            return response
+        await asyncio.sleep(float(response.headers.get('Retry-After', 1)))
+    return response
+
+
+async def play(client, recorder, pair, size, rng):
+    """Play one game to the end. Returns 'completed' or the reason it stopped."""
+    first, second = pair
+    response = await recorder.request(client, 'create_game', 'POST', '/games/',
+                                      json={'player2_id': second.id, 'size': size}, headers=first.headers)
+    if response is None or response.status_code != 201:
+        return 'create_game failed'
+    game = response.json()
+    players = {first.id: first, second.id: second}
+    turn = game['current_turn']['id']
+    board = game['board']
+    while True:
+        x, y = rng.choice([(x, y) for x, row in enumerate(board) for y, cell in enumerate(row)
+                           if cell not in ('X', 'O')])
+        response = await make_move(client, recorder, game['id'], players[turn], x, y)
+        if response is None or response.status_code != 200:
+            return 'make_move failed'
+        state = response.json()
+        if state['status'] != 'ongoing':
+            break
+        turn, board = state['current_turn'], state['board']
+    await recorder.request(client, 'retrieve', 'GET', f"/games/{game['id']}/", headers=first.headers)
+    await recorder.request(client, 'my_games', 'GET', '/games/my_games/', headers=first.headers)
+    return 'completed'
+
+
+def git_commit():
     try:
-        # Test server connection
-        response = requests.get('http://localhost:8000/api/')
-        if response.status_code != 200:
-            print("Server is not running! Please start the server first.")
-            return
-    except requests.exceptions.ConnectionError:
-        print("Cannot connect to server! Please start the server first.")
-        return
-
-    # 1. Register users
-    player1_data = {"username": "testplayer1", "password": "testpass123"}
-    player2_data = {"username": "testplayer2", "password": "testpass123"}
-    
-    response = requests.post(f"{BASE_URL}/register/", json=player1_data)
-    player1 = print_response("Register Player 1", response)
-    
-    response = requests.post(f"{BASE_URL}/register/", json=player2_data)
-    player2 = print_response("Register Player 2", response)
-
-    # 2. Login and get tokens
-    response = requests.post(f"{BASE_URL}/token/", json=player1_data)
-    tokens1 = print_response("Login Player 1", response)
-    if not tokens1:
-        print("Failed to get token for player 1")
-        return
-    
-    response = requests.post(f"{BASE_URL}/token/", json=player2_data)
-    tokens2 = print_response("Login Player 2", response)
-    if not tokens2:
-        print("Failed to get token for player 2")
-        return
-
-    headers1 = {'Authorization': f'Bearer {tokens1["access"]}'}
-    headers2 = {'Authorization': f'Bearer {tokens2["access"]}'}
-
-    # 3. Create a game
-    game_data = {"player2_id": 2}  # Player 2's ID should be 2
-    response = requests.post(f"{BASE_URL}/games/", json=game_data, headers=headers1)
-    game = print_response("Create Game", response)
-    if not game:
-        print("Failed to create game")
-        return
-
-    game_id = game['id']
-
-    # 4. Make moves
-    # Player 1 move
-    move_data = {"position_x": 0, "position_y": 0}
-    response = requests.post(f"{BASE_URL}/games/{game_id}/make_move/", json=move_data, headers=headers1)
-    print_response("Player 1 Move", response)
-
-    # Player 2 move
-    move_data = {"position_x": 1, "position_y": 1}
-    response = requests.post(f"{BASE_URL}/games/{game_id}/make_move/", json=move_data, headers=headers2)
-    print_response("Player 2 Move", response)
-
-    # Player 1 move
-    move_data = {"position_x": 0, "position_y": 1}
-    response = requests.post(f"{BASE_URL}/games/{game_id}/make_move/", json=move_data, headers=headers1)
-    print_response("Player 1 Second Move", response)
-
-    # 5. Get game history
-    response = requests.get(f"{BASE_URL}/games/my_games/", headers=headers1)
-    print_response("Get Game History", response)
-
-    # 6. Get specific game
-    response = requests.get(f"{BASE_URL}/games/{game_id}/", headers=headers1)
-    print_response("Get Game Details", response)
-
-    print("\nAll tests completed!")
-
-if __name__ == "__main__":
-    test_apis()
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    started_at = datetime.now(timezone.utc)
+    # Unique per run, so runs started in the same second never share usernames
+    run_id = uuid.uuid4().hex[:8]
+    players = [Player(f'load{run_id}-{i}') for i in range(args.pairs * 2)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url.rstrip('/'), limits=limits,
+                                 timeout=args.timeout) as client:
+        try:
+            await client.get('/')
+        except httpx.HTTPError:
+            sys.exit(f'Cannot connect to {args.base_url}! Please start the server first.')
+
+        # One semaphore bounds every phase, as the pool bounds connections
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(coroutine):
+            async with semaphore:
+                return await coroutine
+
+        start = time.perf_counter()
+        errors = [e for e in await asyncio.gather(*(bounded(sign_up(client, recorder, p)) for p in players)) if e]
+        setup_elapsed = time.perf_counter() - start
+        if errors:
+            sys.exit(f'{len(errors)} users could not sign up, e.g. {errors[0]}. '
+                     'Is the server running with TICTACTOE_DISABLE_THROTTLING=1?')
+
+        pairs = [(players[i], players[i + 1]) for i in range(0, len(players), 2)]
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(
+            bounded(play(client, recorder, pairs[i % len(pairs)], args.size, random.Random(rng.random())))
+            for i in range(args.games)))
+        games_elapsed = time.perf_counter() - start
+
+    endpoints = recorder.report(games_elapsed)
+    for endpoint in ('register', 'token'):
+        # Only requested while setting up, so their rate is over that phase
+        if endpoint in endpoints:
+            endpoints[endpoint]['throughput'] = endpoints[endpoint]['requests'] / setup_elapsed
+    completed = outcomes.count('completed')
+    game_requests = sum(e['requests'] for name, e in endpoints.items() if name not in ('register', 'token'))
+    return {
+        'run_id': run_id,
+        'started_at': started_at.isoformat(),
+        'git_commit': git_commit(),
+        'config': {
+            'base_url': args.base_url,
+            'pairs': args.pairs,
+            'games': args.games,
+            'concurrency': args.concurrency,
+            'size': args.size,
+            'seed': args.seed,
+        },
+        'setup_seconds': setup_elapsed,
+        'games_seconds': games_elapsed,
+        'games_completed': completed,
+        'games_failed': {reason: outcomes.count(reason) for reason in set(outcomes) - {'completed'}},
+        'games_per_second': completed / games_elapsed,
+        'requests_per_second': game_requests / games_elapsed,
+        'endpoints': endpoints,
+    }
+
+
+def print_report(result, baseline=None):
+    print(f"{result['games_completed']}/{result['config']['games']} games in {result['games_seconds']:.1f}s: "
+          f"{result['games_per_second']:.1f} games/s, {result['requests_per_second']:.0f} requests/s")
+    print(f"{'endpoint':>12}{'requests':>10}{'req/s':>9}{'errors':>8}{'429':>6}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, e in result['endpoints'].items():
+        latency = e['latency_ms']
+        line = (f"{name:>12}{e['requests']:>10}{e['throughput']:>9.1f}{e['error_rate']:>8.1%}{e['throttled']:>6}"
+                f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}")
+        before = baseline and baseline['endpoints'].get(name)
+        if before:
+            change = latency['p95'] / before['latency_ms']['p95'] - 1
+            line += f'  p95 {change:+.0%} vs baseline'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--pairs', type=int, default=10, help='user pairs to register')
+    parser.add_argument('--games', type=int, default=100, help='games to play, spread over the pairs')
+    parser.add_argument('--concurrency', type=int, default=20, help='requests in flight at most')
+    parser.add_argument('--size', type=int, default=3, help='board size')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds per request')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the moves played')
+    parser.add_argument('--output', help='JSON result file (default loadtest-results/<time>-<run id>.json)')
+    parser.add_argument('--baseline', help='earlier JSON result to compare p95 latencies with')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(
+        'loadtest-results', f"{result['started_at'][:19].replace(':', '')}-{result['run_id']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -32,6 +35,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # Makes runserver serve the ASGI application, WebSockets included
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -73,6 +77,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'tictactoe.wsgi.application'
+ASGI_APPLICATION = 'tictactoe.asgi.application'
+
+# Channels: game updates are pushed over WebSockets through an in-process
+# layer, so no external broker is needed. Events only reach sockets held by
+# the same process that handled the move.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -82,9 +96,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than SQLite's shared-cache memory database, so tests
+        # that write from several threads wait on locks instead of failing
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# SQLite profile. TICTACTOE_DB_PROFILE=production enables WAL so readers
+# never block the writer, relaxes fsync to the end of each WAL checkpoint,
+# waits on locks instead of failing with "database is locked", and keeps
+# connections open across requests. The PRAGMAs are applied to every new
+# connection by game.db.configure_sqlite. It is opt-in: WAL is persistent,
+# so turning it on by default would convert db.sqlite3 on any manage.py
+# run. The default, 'default', leaves SQLite's stock behaviour.
+DB_PROFILE = os.environ.get('TICTACTOE_DB_PROFILE', 'default')
+
+SQLITE_PRAGMAS = {}
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+    })
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000,  # ms
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,  # negative means KiB, so 64 MB
+        'temp_store': 'MEMORY',
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -130,10 +174,79 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'game.authentication.CachedJWTAuthentication',
     ),
+    # Token buckets per scope, see game.throttling: a client may burst N
+    # requests, then N per period. Scopes left out are not throttled
+    'DEFAULT_THROTTLE_RATES': {
+        'make_move': '120/min',  # Per user
+        'register': '20/hour',   # Per IP
+        'token': '30/min',       # Per IP; every attempt runs the password hasher
+    },
+    # Reverse proxies in front of the app. Per-IP limits key on the address
+    # this many hops from the end of X-Forwarded-For; with 0 the header is
+    # ignored for REMOTE_ADDR, so clients cannot pick a fresh bucket for
+    # each request by sending a made-up header
+    'NUM_PROXIES': int(os.environ.get('TICTACTOE_NUM_PROXIES', 0)),
 }
 
+# For load tests from a single client IP (see test_api.py): no scope has a
+# rate, so nothing is throttled. Never set it in production; it is refused
+# unless DEBUG is on
+if os.environ.get('TICTACTOE_DISABLE_THROTTLING'):
+    if not DEBUG:
+        raise ImproperlyConfigured('TICTACTOE_DISABLE_THROTTLING is only allowed with DEBUG on')
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}
+
+# Where throttle buckets live: 'memory' (per worker process) or 'sqlite'
+# (THROTTLE_SQLITE_PATH, shared by the workers of one host). Idle buckets
+# are dropped every THROTTLE_EVICT_INTERVAL seconds
+THROTTLE_STORE = os.environ.get('TICTACTOE_THROTTLE_STORE', 'memory')
+THROTTLE_SQLITE_PATH = os.environ.get('TICTACTOE_THROTTLE_SQLITE_PATH', str(BASE_DIR / 'throttle.sqlite3'))
+THROTTLE_EVICT_INTERVAL = 60
+
+# Users resolved by CachedJWTAuthentication are kept in each worker for this
+# many seconds (the delay before another worker sees a deactivation or a
+# password change), at most AUTH_USER_CACHE_SIZE of them
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_SIZE = 10000
+
+# Long-poll games/{id}/wait/: longest a request may block, and how often a
+# blocked request re-checks the database for moves made by other workers
+GAME_WAIT_TIMEOUT = 30
+GAME_WAIT_POLL_INTERVAL = 2
+
+# Seconds a worker's in-process leaderboard is trusted before reloading, to
+# pick up games completed by other workers
+LEADERBOARD_CACHE_TTL = 300
+
+# Matchmaking: largest rating gap paired straight away, how many points it
+# widens per second waited, how many nearby players are tried per attempt,
+# and how often a worker reloads the queue to see players queued elsewhere
+MATCHMAKING_RATING_GAP = 100
+MATCHMAKING_GAP_PER_SECOND = 10
+MATCHMAKING_CANDIDATES = 5
+MATCHMAKING_RELOAD_INTERVAL = 10
+
+# Computer opponent (the game.ai.BOT_USERNAME user): boards larger than 3x3
+# are searched for at most BOT_MOVE_TIME seconds and BOT_SEARCH_DEPTH plies
+# per reply
+BOT_MOVE_TIME = 1.0
+BOT_SEARCH_DEPTH = 4
+
+# Where moves are kept: 'rows' writes a Move row per move, 'log' keeps only
+# the packed Game.move_log (always written) and serves moves from it
+GAME_MOVE_STORAGE = os.environ.get('TICTACTOE_MOVE_STORAGE', 'rows')
+
+# `manage.py archive_games` moves games finished more than this many days
+# ago out of the game tables into game_archivedgame
+GAME_ARCHIVE_AFTER_DAYS = 30
+
+# Solved 3x3 table read by the computer player and games/{id}/analysis/.
+# Memory-mapped by every worker; written on first use if missing, or ahead
+# of time with `manage.py build_tablebase`
+TABLEBASE_PATH = os.environ.get('TICTACTOE_TABLEBASE_PATH', str(BASE_DIR / 'tablebase3x3.bin'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only, configure properly in production
 